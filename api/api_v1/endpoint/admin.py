@@ -1,11 +1,19 @@
 from typing import List, Optional, Generic, TypeVar
 from pydantic.generics import GenericModel
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Path, Query, UploadFile
+from pydantic import BaseModel
+from redis.asyncio import Redis
 
 import schemas
 from api import deps
-from core import security
-
+from api.responses import fastJSON
+from core import acl, security
+from core.importer import ImportFileError, importStudents, importTeachers, readUploadRows
+from core.principal import invalidatePrincipal
+from core.throttle import getLoginThrottleStats
+from db.database import getPoolStats, replicaEngines
+
+from crud.base import decodeCursor
 from crud.crud_teacher import teacher
 from crud.crud_student import student
 from crud.crud_profession import profession
@@ -13,9 +21,13 @@ from crud.crud_class import class_
 from crud.crud_option import option
 from crud.crud_lesson import lesson
 from crud.crud_clr import classLessonRelation
+from models.option import Option
 
 
-admin_router = r = APIRouter(dependencies=[Depends(deps.isAdmin)])
+admin_router = r = APIRouter(
+    dependencies=[Depends(deps.isAdmin)],
+    route_class=deps.ReleaseDBRoute
+)
 
 
 DataT = TypeVar("DataT")
@@ -24,11 +36,67 @@ DataT = TypeVar("DataT")
 class PaginatedData(GenericModel, Generic[DataT]):
     data: List[DataT]
     total: int
+    total_exact: bool = True
+    next: Optional[str] = None
+
+
+class PageParams(BaseModel):
+    offset: int
+    limit: int
+    after: Optional[str]
+    approximate: bool
+
+
+def getPageParams(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=5, le=50),
+    after: Optional[str] = Query(None, max_length=512),
+    approximate_total: bool = Query(False),
+) -> PageParams:
+    """
+    传入 after 游标时按游标翻页，忽略 page；否则保持原有的页码分页
+    approximate_total 为真且未搜索时，总数取自表统计信息，返回的 total_exact 为 false
+    """
+    if after is not None:
+        try:
+            decodeCursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return PageParams(
+        offset=(page - 1) * page_size,
+        limit=page_size,
+        after=after,
+        approximate=approximate_total
+    )
+
+
+class ImportRowError(BaseModel):
+    row: int
+    id: Optional[str]
+    detail: str
+
+
+class ImportReturn(BaseModel):
+    total: int
+    created: int
+    errors: List[ImportRowError]
+
+
+@r.get("/metrics")
+async def getMetrics(
+    redis: Redis = Depends(deps.getRedis),
+):
+    return {
+        "password_hash": security.getPasswordHashStats(),
+        "login_throttle": await getLoginThrottleStats(redis),
+        "database_pool": getPoolStats(),
+        "database_replica_pools": [getPoolStats(e) for e in replicaEngines],
+    }
 
 
 @r.get("/option/list", response_model=List[schemas.Option])
 async def getOption(
-    db=Depends(deps.getDB)
+    db=Depends(deps.getReadDB)
 ):
     return await option.getOptions(db)
 
@@ -39,21 +107,20 @@ async def putOption(
     optionUpdate: schemas.OptionUpdate = Body(),
     db=Depends(deps.getDB),
 ):
-    if o := await option.getByKey(db, key=key):
-        await option.update(db, db_obj=o, obj_in={"value": optionUpdate.value})
-    else:
+    if not await option.updateMany(db, [Option.key == key], {"value": optionUpdate.value}):
         await option.create(db, obj_in={"key": key, "value": optionUpdate.value})
 
 
 @r.get("/profession/list", response_model=PaginatedData[schemas.Profession])
+@fastJSON(PaginatedData[schemas.Profession])
 async def getProfessionList(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=5, le=50),
     keyword: Optional[str] = Query(None, max_length=20),
-    db=Depends(deps.getDB),
+    paging: PageParams = Depends(getPageParams),
+    db=Depends(deps.getReadDB),
 ):
-    ps, total = await profession.getPaginatedMultiByOptionalKeyword(db, keyword, (page - 1) * page_size, page_size)
-    return {"data": ps, "total": total}
+    ps, total, totalExact, nextCursor = await profession.getMultiByOptionalKeyword(
+        db, keyword, **paging.dict(), columns=profession.columnsFor(schemas.Profession))
+    return {"data": ps, "total": total, "total_exact": totalExact, "next": nextCursor}
 
 
 @r.post("/profession")
@@ -71,7 +138,8 @@ async def putProfession(
     professionUpdate: schemas.ProfessionUpdate = Body(),
     db=Depends(deps.getDB),
 ):
-    await profession.update(db, db_obj=await profession.get(db, id=id), obj_in=professionUpdate)
+    if not await profession.patch(db, id, professionUpdate):
+        raise HTTPException(status_code=404, detail="Profession not found")
 
 
 @r.delete("/profession/{id}")
@@ -83,14 +151,15 @@ async def deleteProfession(
 
 
 @r.get("/teacher/list", response_model=PaginatedData[schemas.Teacher])
+@fastJSON(PaginatedData[schemas.Teacher])
 async def getTeacherList(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=5, le=50),
     keyword: Optional[str] = Query(None, max_length=20),
-    db=Depends(deps.getDB),
+    paging: PageParams = Depends(getPageParams),
+    db=Depends(deps.getReadDB),
 ):
-    ts, total = await teacher.getMultiByOptionalKeyword(db, keyword, (page - 1) * page_size, page_size)
-    return {"data": ts, "total": total}
+    ts, total, totalExact, nextCursor = await teacher.getMultiByOptionalKeyword(
+        db, keyword, **paging.dict(), columns=teacher.columnsFor(schemas.Teacher))
+    return {"data": ts, "total": total, "total_exact": totalExact, "next": nextCursor}
 
 
 @r.post("/teacher")
@@ -103,39 +172,60 @@ async def postTeacher(
 
     await teacher.create(db, obj_in={
         **teacherCreate.dict(),
-        "hashed_password": security.getPasswordHash(teacherCreate.id),
+        "hashed_password": await security.getPasswordHashAsync(teacherCreate.id),
     })
 
 
+@r.post("/teacher/import", response_model=ImportReturn)
+async def importTeacher(
+    file: UploadFile = File(),
+    db=Depends(deps.getDB),
+):
+    try:
+        rows = readUploadRows(file)
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    return await importTeachers(db, rows)
+
+
 @r.put("/teacher/{id}")
 async def putTeacher(
     id: str = Path(min_length=1, max_length=255),
     teacherUpdate: schemas.TeacherUpdate = Body(),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
 ):
-    await teacher.update(db, db_obj=await teacher.get(db, id=id), obj_in={
+    if not await teacher.patch(db, id, {
         **teacherUpdate.dict(exclude={"reset_password"}),
-        "hashed_password": security.getPasswordHash(id),
-    } if teacherUpdate.reset_password else teacherUpdate.dict(exclude={"reset_password"}))
+        "hashed_password": await security.getPasswordHashAsync(id),
+    } if teacherUpdate.reset_password else teacherUpdate.dict(exclude={"reset_password"})):
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    await invalidatePrincipal(redis, "teacher", id)
+    if teacherUpdate.id != id:
+        await invalidatePrincipal(redis, "teacher", teacherUpdate.id)
+        await acl.invalidateTeacherLessons([id, teacherUpdate.id])
 
 
 @r.delete("/teacher/{id}")
 async def deleteTeacher(
     id: str = Path(min_length=1, max_length=255),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
 ):
     await teacher.remove(db, id=id)
+    await invalidatePrincipal(redis, "teacher", id)
 
 
 @r.get("/student/list", response_model=PaginatedData[schemas.Student])
+@fastJSON(PaginatedData[schemas.Student])
 async def getStudentList(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=5, le=50),
     keyword: Optional[str] = Query(None, max_length=20),
-    db=Depends(deps.getDB),
+    paging: PageParams = Depends(getPageParams),
+    db=Depends(deps.getReadDB),
 ):
-    ts, total = await student.getMultiByOptionalKeyword(db, keyword, (page - 1) * page_size, page_size)
-    return {"data": ts, "total": total}
+    ts, total, totalExact, nextCursor = await student.getMultiByOptionalKeyword(
+        db, keyword, **paging.dict(), columns=student.columnsFor(schemas.Student))
+    return {"data": ts, "total": total, "total_exact": totalExact, "next": nextCursor}
 
 
 @r.post("/student")
@@ -145,41 +235,60 @@ async def postStudent(
 ):
     await student.create(db, obj_in={
         **studentCreate.dict(),
-        "hashed_password": security.getPasswordHash(studentCreate.id),
+        "hashed_password": await security.getPasswordHashAsync(studentCreate.id),
     })
 
 
+@r.post("/student/import", response_model=ImportReturn)
+async def importStudent(
+    file: UploadFile = File(),
+    db=Depends(deps.getDB),
+):
+    try:
+        rows = readUploadRows(file)
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    return await importStudents(db, rows)
+
+
 @r.put("/student/{id}")
 async def putStudent(
     id: str = Path(min_length=1, max_length=255),
     studentUpdate: schemas.StudentUpdate = Body(),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
 ):
-    await student.update(db, db_obj=await student.get(db, id=id), obj_in={
+    if not await student.patch(db, id, {
         **studentUpdate.dict(exclude={"reset_password"}),
-        "hashed_password": security.getPasswordHash(id),
-    } if studentUpdate.reset_password else studentUpdate.dict(exclude={"reset_password"}))
+        "hashed_password": await security.getPasswordHashAsync(id),
+    } if studentUpdate.reset_password else studentUpdate.dict(exclude={"reset_password"})):
+        raise HTTPException(status_code=404, detail="Student not found")
+    await invalidatePrincipal(redis, "student", id)
+    if studentUpdate.id != id:
+        await invalidatePrincipal(redis, "student", studentUpdate.id)
 
 
 @r.delete("/student/{id}")
 async def deleteStudent(
     id: str = Path(min_length=1, max_length=255),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
 ):
     await student.remove(db, id=id)
+    await invalidatePrincipal(redis, "student", id)
 
 
 @r.get("/class/list", response_model=PaginatedData[schemas.Class])
+@fastJSON(PaginatedData[schemas.Class])
 async def getClassList(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=5, le=50),
     keyword: Optional[str] = Query(None, max_length=20),
-    db=Depends(deps.getDB),
+    paging: PageParams = Depends(getPageParams),
+    db=Depends(deps.getReadDB),
 ):
-    cs, total = await class_.getMultiByOptionalKeyword(
-        db, keyword, (page - 1) * page_size, page_size)
+    cs, total, totalExact, nextCursor = await class_.getMultiByOptionalKeyword(
+        db, keyword, **paging.dict(), columns=class_.columnsFor(schemas.Class))
 
-    return {"data": cs, "total": total}
+    return {"data": cs, "total": total, "total_exact": totalExact, "next": nextCursor}
 
 
 @r.post("/class")
@@ -196,7 +305,8 @@ async def putClass(
     classUpdate: schemas.ClassUpdate = Body(),
     db=Depends(deps.getDB),
 ):
-    await class_.update(db, db_obj=await class_.get(db, id=id), obj_in=classUpdate)
+    if not await class_.patch(db, id, classUpdate):
+        raise HTTPException(status_code=404, detail="Class not found")
 
 
 @r.delete("/class/{id}")
@@ -208,16 +318,16 @@ async def deleteClass(
 
 
 @r.get("/lesson/list", response_model=PaginatedData[schemas.Lesson])
+@fastJSON(PaginatedData[schemas.Lesson])
 async def getLessonList(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=5, le=50),
     keyword: Optional[str] = Query(None, max_length=20),
-    db=Depends(deps.getDB),
+    paging: PageParams = Depends(getPageParams),
+    db=Depends(deps.getReadDB),
 ):
-    ls, total = await lesson.getMultiByOptionalKeyword(
-        db, keyword, (page - 1) * page_size, page_size)
+    ls, total, totalExact, nextCursor = await lesson.getMultiByOptionalKeyword(
+        db, keyword, **paging.dict(), columns=lesson.columnsFor(schemas.Lesson))
 
-    return {"data": ls, "total": total}
+    return {"data": ls, "total": total, "total_exact": totalExact, "next": nextCursor}
 
 
 @r.post("/lesson")
@@ -234,7 +344,8 @@ async def putLesson(
     lessonUpdate: schemas.LessonUpdate = Body(),
     db=Depends(deps.getDB),
 ):
-    await lesson.update(db, db_obj=await lesson.get(db, id=id), obj_in=lessonUpdate)
+    if not await lesson.patch(db, id, lessonUpdate):
+        raise HTTPException(status_code=404, detail="Lesson not found")
 
 
 @r.delete("/lesson/{id}")
@@ -246,11 +357,12 @@ async def deleteLesson(
 
 
 @r.get("/lesson/{lesson_id}/class/list", response_model=List[schemas.Class])
+@fastJSON(List[schemas.Class])
 async def getLessonClassList(
     lesson_id: int = Path(ge=1),
-    db=Depends(deps.getDB),
+    db=Depends(deps.getReadDB),
 ):
-    return await class_.getMultiByLessonId(db, lesson_id)
+    return await class_.getMultiByLessonId(db, lesson_id, class_.columnsFor(schemas.Class))
 
 
 @r.put("/lesson/{lesson_id}/class")
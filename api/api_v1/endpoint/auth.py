@@ -1,17 +1,20 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
+from redis.asyncio import Redis
 
 from api import deps
 from core import security
 from core.config import settings
+from core.principal import getClaimsVersion
+from core.throttle import LoginThrottledError, consumeLoginToken
 from crud.crud_admin import admin
 from crud.crud_student import student
 from crud.crud_teacher import teacher
 
 
-auth_router = r = APIRouter()
+auth_router = r = APIRouter(route_class=deps.ReleaseDBRoute)
 
 
 class Token(BaseModel):
@@ -20,9 +23,22 @@ class Token(BaseModel):
 
 
 @r.post("/login", response_model=Token)
-async def login(db=Depends(deps.getDB), formData: OAuth2PasswordRequestForm = Depends()):
+async def login(
+    request: Request,
+    db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
+    formData: OAuth2PasswordRequestForm = Depends(),
+):
     role = formData.scopes.pop()
     username = formData.username
+    try:
+        await consumeLoginToken(redis, username, request.client.host)
+    except LoginThrottledError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     if role == "student":
         user = await student.authenticate(db, formData.username, formData.password)
     elif role == "teacher":
@@ -40,8 +56,16 @@ async def login(db=Depends(deps.getDB), formData: OAuth2PasswordRequestForm = De
     accessTokenExpires = timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
+    data = {"username": username, "scope": role}
+    if settings.ACCESS_TOKEN_WITH_CLAIMS:
+        data.update({
+            "ver": settings.ACCESS_TOKEN_CLAIMS_VERSION,
+            "uver": await getClaimsVersion(redis, role, username),
+            "name": user.name,
+            "class_id": user.class_id if role == "student" else None,
+        })
     accessToken = security.createAccessToken(
-        data={"username": username, "scope": role},
+        data=data,
         expiresDelta=accessTokenExpires,
     )
     return {"access_token": accessToken, "token_type": "bearer"}
@@ -7,6 +7,7 @@ from fastapi import APIRouter, Body, Depends, HTTPException
 
 import schemas
 from api import deps
+from api.responses import fastJSON
 from core.classroom import (
     ClassroomAlreadyOpenError,
     ClassroomNotOpenError,
@@ -27,16 +28,17 @@ from core.dynamic import (
     sendDynamicToTeacher
 )
 from crud.crud_lesson import lesson
-from crud.crud_teacher import teacher
 from crud.crud_task import task
 from crud.crud_student import student
 from crud.crud_lr import lessonRecord
 from crud.crud_sts import studentTaskStatus
 from crud.crud_class import class_
 from crud.crud_option import option
+from models.student_task_status import StudentTaskStatus
+from schemas.lesson_record import LessonRecord
 
 
-lesson_router = r = APIRouter()
+lesson_router = r = APIRouter(route_class=deps.ReleaseDBRoute)
 
 
 class LessonsReturn(BaseModel):
@@ -49,22 +51,31 @@ class LessonDetailReturn(BaseModel):
     teacher: schemas.Teacher
 
 
+# 只用于预编译字段提取，不挂到路由的 response_model 上
+class ClassroomPreData(BaseModel):
+    classes: List[schemas.Class]
+    students: List[schemas.Student]
+    histories: List[LessonRecord]
+
+
 class LessonTaskReturn(BaseModel):
     tasks: List[schemas.Task]
     statuses: Optional[List[schemas.StudentTaskStatus]]
 
 
 @r.get("", response_model=LessonsReturn)
+@fastJSON(LessonsReturn)
 async def getLessons(
-    db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    db=Depends(deps.getReadDB),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
+    columns = lesson.columnsFor(schemas.LessonBrief)
     if scope == "teacher":
-        ls = await lesson.getMultiByTeacherId(db, user.id)
+        ls = await lesson.getMultiByTeacherId(db, user.id, columns)
     elif scope == "student":
-        ls = await lesson.getMultiByClassId(db, user.class_id)
+        ls = await lesson.getMultiByClassId(db, user.class_id, columns)
     else:
         raise HTTPException(status_code=403, detail="Forbidden")
 
@@ -75,34 +86,16 @@ async def getLessons(
 @r.get("/{lesson_id}", response_model=LessonDetailReturn)
 async def getLessonDetail(
     lesson_id: int,
-    db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    ctx: deps.LessonContext = Depends(deps.getLessonContext),
 ):
-    user, scope = currentUser
-
-    if scope == "teacher":
-        hasLesson = await lesson.isTeacherHasLesson(db, user.id, lesson_id)
-        if not hasLesson:
-            raise HTTPException(
-                status_code=403, detail="You are not the teacher of this lesson")
-    elif scope == "student":
-        hasLesson = await lesson.isClassHasLesson(db, user.class_id, lesson_id)
-        if not hasLesson:
-            raise HTTPException(
-                status_code=403, detail="You are not the student of this lesson")
-    else:
-        raise HTTPException(status_code=403, detail="Forbidden")
-
-    l = await lesson.get(db, lesson_id)
-    t = await teacher.get(db, l.teacher_id)
-    return {"lesson": l, "teacher": t}
+    return {"lesson": ctx.lesson, "teacher": ctx.teacher}
 
 
 @r.get("/{lesson_id}/task", response_model=LessonTaskReturn)
 async def getLessonTask(
     lesson_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -135,23 +128,22 @@ async def putTaskStatus(
     task_id: int,
     statusUpdate: schemas.StudentTaskStatusUpdate = Body(),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    ctx: deps.LessonContext = Depends(deps.getLessonContext),
 ):
-    user, scope = currentUser
+    user = ctx.user
 
-    if scope != "student" and not await lesson.isClassHasLesson(db, user.class_id, lesson_id):
+    if ctx.scope != "student":
         raise HTTPException(
             status_code=403, detail="You are not the student of this lesson")
 
-    if not await studentTaskStatus.isStudentHasTaskStatus(db, user.id, task_id):
+    ts = await studentTaskStatus.getByStudentIdAndTaskId(db, user.id, task_id)
+    if not ts:
         raise HTTPException(
             status_code=403, detail="You don't have this task")
 
-    ts = await studentTaskStatus.getByStudentIdAndTaskId(db, user.id, task_id)
-    t = await task.get(db, task_id)
     if ts.status == "uncompleted":
-        l = await lesson.get(db, lesson_id)
-        await sendDynamicToTeacher(db, l.teacher_id, lesson_id, f"{user.name} 完成了任务 {t.title}，请老师及时批改。")
+        t = await task.get(db, task_id)
+        await sendDynamicToTeacher(db, ctx.lesson.teacher_id, lesson_id, f"{user.name} 完成了任务 {t.title}，请老师及时批改。")
 
     if ts.status == "checked":
         raise HTTPException(
@@ -176,19 +168,18 @@ async def putTask(
     task_id: int,
     taskUpdate: schemas.TaskUpdate = Body(),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    ctx: deps.LessonContext = Depends(deps.getLessonContext),
 ):
-    user, scope = currentUser
-
-    if scope != "teacher" and not await lesson.isTeacherHasLesson(db, user.id, lesson_id):
+    if ctx.scope != "teacher":
         raise HTTPException(
             status_code=403, detail="You are not the teacher of this lesson")
 
-    if not await task.isTeacherHasTask(db, user.id, task_id):
+    t = await task.get(db, task_id)
+    if not t or t.lesson_id != lesson_id:
         raise HTTPException(
             status_code=403, detail="You don't have permission to edit this task")
 
-    t = await task.update(db, db_obj=await task.get(db, task_id), obj_in=taskUpdate)
+    t = await task.update(db, db_obj=t, obj_in=taskUpdate)
     if taskUpdate.deadline > int(time.time()):
         await studentTaskStatus.updateMultiExpiredToOtherByTaskId(db, task_id)
     await boardcastDynamicToLesson(db, lesson_id, f"任务 {t.title} 已更新，请及时完成。")
@@ -199,7 +190,7 @@ async def putTaskStatusEnd(
     lesson_id: int,
     task_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -221,7 +212,7 @@ async def postTask(
     lesson_id: int,
     taskCreate: schemas.TaskCreate = Body(),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -234,11 +225,7 @@ async def postTask(
         "lesson_id": lesson_id,
         "created_time": int(time.time())
     })
-    class_ids = [theClass.id for theClass in await class_.getMultiByLessonId(db, lesson_id)]
-    student_ids = []
-    for class_id in class_ids:
-        student_ids += [student.id for student in await student.getMultiByClassId(db, class_id)]
-    await studentTaskStatus.insertMultiByStudentIdsAndTaskId(db, student_ids, t.id)
+    await studentTaskStatus.insertMultiByLessonIdAndTaskId(db, lesson_id, t.id)
     await boardcastDynamicToLesson(db, lesson_id, f"老师布置了新任务 {t.title}，请及时完成。")
 
 
@@ -247,7 +234,7 @@ async def deleteTask(
     lesson_id: int,
     task_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -274,7 +261,7 @@ async def getTaskStatusChecking(
     lesson_id: int,
     task_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -286,7 +273,8 @@ async def getTaskStatusChecking(
         raise HTTPException(
             status_code=403, detail="You don't have permission to check this task")
 
-    return await studentTaskStatus.getMultiByTaskId(db, task_id)
+    return await studentTaskStatus.selectRows(
+        db, studentTaskStatus.columnsFor(schemas.StudentTaskStatus), [StudentTaskStatus.task_id == task_id])
 
 
 @r.put("/{lesson_id}/task/{task_id}/status-checking")
@@ -296,7 +284,7 @@ async def putTaskStatusChecking(
     student_id: str = Body(embed=True),
     score: int = Body(embed=True),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -309,12 +297,15 @@ async def putTaskStatusChecking(
             status_code=403, detail="You don't have permission to check this task")
 
     t = await task.get(db, task_id)
-    await studentTaskStatus.update(
-        db, db_obj=await studentTaskStatus.getByStudentIdAndTaskId(db, student_id, task_id),
-        obj_in={
-            "score": score,
-            "status": "checked"
-        })
+    if not await studentTaskStatus.updateMany(db, [
+        StudentTaskStatus.student_id == student_id,
+        StudentTaskStatus.task_id == task_id
+    ], {
+        "score": score,
+        "status": "checked"
+    }):
+        raise HTTPException(
+            status_code=404, detail="Task status not found")
     await sendDynamicToStudent(
         db, student_id, lesson_id,
         f"{user.name} 完成了任务 {t.title} 的批改，你的成绩是 {score} ，请及时查看。"
@@ -326,7 +317,7 @@ async def putNotice(
     lesson_id: int,
     notice: str = Body(embed=True),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -334,7 +325,7 @@ async def putNotice(
         raise HTTPException(
             status_code=403, detail="You are not the teacher of this lesson")
 
-    await lesson.update(db, db_obj=await lesson.get(db, lesson_id), obj_in={"notice": notice})
+    await lesson.patch(db, lesson_id, {"notice": notice})
     await boardcastDynamicToLesson(db, lesson_id, f"老师更新了课程公告。")
 
 
@@ -343,7 +334,7 @@ async def putCourseware(
     lesson_id: int,
     courseware: str = Body(embed=True),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -351,7 +342,7 @@ async def putCourseware(
         raise HTTPException(
             status_code=403, detail="You are not the teacher of this lesson")
 
-    await lesson.update(db, db_obj=await lesson.get(db, lesson_id), obj_in={"courseware": courseware})
+    await lesson.patch(db, lesson_id, {"courseware": courseware})
     await boardcastDynamicToLesson(db, lesson_id, f"老师更新了课程课件。")
 
 
@@ -360,7 +351,7 @@ async def getClassroom(
     lesson_id: int,
     db=Depends(deps.getDB),
     redis: Redis = Depends(deps.getRedis),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -389,26 +380,14 @@ async def getClassroom(
 
 
 @r.get("/{lesson_id}/classroom/pre-data")
+@fastJSON(ClassroomPreData)
 async def getClassroomPreData(
     lesson_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    ctx: deps.LessonContext = Depends(deps.getLessonContext),
 ):
-    user, scope = currentUser
-
-    if scope == "teacher" and not await lesson.isTeacherHasLesson(db, user.id, lesson_id):
-        raise HTTPException(
-            status_code=403, detail="You are not the teacher of this lesson")
-    elif scope == "student" and not await lesson.isClassHasLesson(db, user.class_id, lesson_id):
-        raise HTTPException(
-            status_code=403, detail="You are not the student of this lesson")
-
-    classes = await class_.getMultiByLessonId(db, lesson_id)
-    students = []
-    for c in classes:
-        students += [
-            schemas.Student.from_orm(student) for student in await student.getMultiByClassId(db, c.id)
-        ]
+    classes = await class_.getMultiByLessonId(db, lesson_id, class_.columnsFor(schemas.Class))
+    students = await student.getMultiByLessonId(db, lesson_id, student.columnsFor(schemas.Student))
     historys = await lessonRecord.getMultiByLessonId(db, lesson_id)
     return {"classes": classes, "students": students, "histories": historys}
 
@@ -418,7 +397,7 @@ async def getClassroomHistory(
     lesson_id: int,
     history_id: int,
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -444,7 +423,7 @@ async def putClassroomBegin(
     expiration: int = Body(embed=True),
     db=Depends(deps.getDB),
     redis: Redis = Depends(deps.getRedis),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -465,7 +444,7 @@ async def putClassroomEnd(
     lesson_id: int,
     db=Depends(deps.getDB),
     redis: Redis = Depends(deps.getRedis),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -498,7 +477,7 @@ async def putClassroomAttendance(
     qrcode: str = Body(embed=True),
     db=Depends(deps.getDB),
     redis: Redis = Depends(deps.getRedis),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
@@ -528,7 +507,7 @@ async def getClassroomRoll(
     question: str = "",
     db=Depends(deps.getDB),
     redis: Redis = Depends(deps.getRedis),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
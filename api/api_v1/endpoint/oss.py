@@ -29,7 +29,7 @@ from crud.crud_student import student
 from crud.crud_teacher import teacher
 
 
-oss_router = r = APIRouter()
+oss_router = r = APIRouter(route_class=deps.ReleaseDBRoute)
 
 
 def randomString(length: int = 4):
@@ -47,7 +47,7 @@ async def putHomeworkObject(
     files: List[UploadFile] = File(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
     if scope != "student" or not await studentTaskStatus.isStudentHasTaskStatus(db, user.id, task_id):
@@ -78,7 +78,7 @@ async def deleteHomeworkObject(
     filenames: List[str] = Body(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -104,7 +104,7 @@ async def putCoursewareObject(
     files: List[UploadFile] = File(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
     if scope != "teacher" or not await lesson.isTeacherHasLesson(db, user.id, lesson_id):
@@ -135,7 +135,7 @@ async def deleteCoursewareObject(
     filenames: List[str] = Body(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -163,7 +163,7 @@ async def putCloudObjects(
     files: List[UploadFile] = File(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -187,7 +187,7 @@ async def deleteCloudObjects(
     names: List[str] = Body(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -211,7 +211,7 @@ async def getCloudObject(
     path: str = Query(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -233,7 +233,7 @@ async def downloadCloudObject(
     path: str = Query(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -269,7 +269,7 @@ async def renameCloudObject(
     new_name: str = Body(embed=True),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -300,7 +300,7 @@ async def moveCloudObjects(
     names: List[str] = Body(embed=True),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -332,7 +332,7 @@ async def copyCloudObjects(
     names: List[str] = Body(embed=True),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -359,7 +359,7 @@ async def copyCloudObjects(
 async def getSharedCloudObjects(
     share_id: str = Query(),
     db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -384,7 +384,7 @@ async def shareCloudObjects(
     cloudShareCreate: schemas.CloudShareCreate = Body(),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -431,7 +431,7 @@ async def recvSharedCloudObjects(
     path: str = Body(embed=True),
     db=Depends(deps.getDB),
     oss=Depends(deps.getOSS),
-    currentUser=Depends(deps.getCurrentUserAndScope)
+    currentUser=Depends(deps.getCurrentPrincipal)
 ):
     user, scope = currentUser
 
@@ -1,10 +1,13 @@
 from typing import List, Optional, Union
 from fastapi import APIRouter, Body, Depends, HTTPException, status
 from pydantic import BaseModel, constr
+from redis.asyncio import Redis
 
 import schemas
 from api import deps
-from core.security import getPasswordHash, verifyPassword
+from api.responses import fastJSON
+from core.principal import invalidatePrincipal
+from core.security import getPasswordHashAsync, verifyPasswordAsync
 from crud.crud_class import class_
 from crud.crud_profession import profession
 from crud.crud_student import student
@@ -15,7 +18,7 @@ from crud.crud_lesson import lesson
 from crud.crud_task import task
 
 
-public_router = r = APIRouter()
+public_router = r = APIRouter(route_class=deps.ReleaseDBRoute)
 
 
 class TaskWithLessonTitle(schemas.Task):
@@ -33,23 +36,22 @@ class DashboardReturn(BaseModel):
 
 
 @r.get("/dashboard", response_model=DashboardReturn)
+@fastJSON(DashboardReturn)
 async def getDashboard(
-    db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    db=Depends(deps.getReadDB),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
     if scope == "teacher":
         uncompletedLessons = [
-            l for l in await lesson.getMultiByTeacherId(db, user.id) if l.is_over == 0]
+            l for l in await lesson.getMultiByTeacherId(db, user.id, lesson.columnsFor(schemas.LessonBrief))
+            if l["is_over"] == 0]
         uncheckedTasks = [{
             **t[0].to_dict(),
             "lesson_title": t[1].title
         } for t in await task.getMultiWithUncheckExpiredStatusByTeacherId(db, user.id)]
-        dynamics = [{
-            **item[0].to_dict(),
-            "lesson_title": item[1].title,
-        } for item in await dynamic.getMultiByUserIdAndScope(db, user.id, scope)]
+        dynamics = await dynamic.getMultiByUserIdAndScope(db, user.id, scope)
         return {
             "uncompleted_tasks": uncheckedTasks,
             "uncompleted_lessons": uncompletedLessons,
@@ -57,15 +59,13 @@ async def getDashboard(
         }
     elif scope == "student":
         uncompletedLessons = [
-            l for l in await lesson.getMultiByClassId(db, user.class_id) if l.is_over == 0]
+            l for l in await lesson.getMultiByClassId(db, user.class_id, lesson.columnsFor(schemas.LessonBrief))
+            if l["is_over"] == 0]
         uncompletedTasks = [{
             **t[0].to_dict(),
             "lesson_title": t[2].title
         } for t in await task.getMultiByStudentId(db, user.id) if t[1].status == "uncompleted"]
-        dynamics = [{
-            **item[0].to_dict(),
-            "lesson_title": item[1].title,
-        } for item in await dynamic.getMultiByUserIdAndScope(db, user.id, scope)]
+        dynamics = await dynamic.getMultiByUserIdAndScope(db, user.id, scope, user.class_id)
         return {
             "uncompleted_tasks": uncompletedTasks,
             "uncompleted_lessons": uncompletedLessons,
@@ -126,6 +126,7 @@ class UserInfoUpdate(BaseModel):
 async def updatePersonalInfo(
     info: UserInfoUpdate = Body(),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
     currentUser=Depends(deps.getCurrentUserAndScope),
 ):
     user, scope = currentUser
@@ -141,12 +142,13 @@ async def updatePersonalInfo(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid request",
         )
-    await crudObj.update(db, db_obj=user, obj_in={
+    await crudObj.update(db, db_obj=await crudObj.get(db, id=user.id), obj_in={
         "email": info.email,
         "phone": info.phone,
         "introduction": info.introduction,
         "avatar": info.avatar,
     })
+    await invalidatePrincipal(redis, scope, user.id)
 
 
 class PasswordUpdate(BaseModel):
@@ -158,15 +160,11 @@ class PasswordUpdate(BaseModel):
 async def updatePassword(
     data: PasswordUpdate = Body(),
     db=Depends(deps.getDB),
+    redis: Redis = Depends(deps.getRedis),
     currentUser=Depends(deps.getCurrentUserAndScope),
 ):
     user, scope = currentUser
 
-    if not verifyPassword(data.old_password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Wrong old password",
-        )
     crudObj = None
     if scope == "student":
         crudObj = student
@@ -179,21 +177,25 @@ async def updatePassword(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid request",
         )
+    user = await crudObj.get(db, id=user.id)
+    if not await verifyPasswordAsync(data.old_password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Wrong old password",
+        )
     await crudObj.update(db, db_obj=user, obj_in={
-        "hashed_password": getPasswordHash(data.new_password),
+        "hashed_password": await getPasswordHashAsync(data.new_password),
     })
+    await invalidatePrincipal(redis, scope, user.id)
 
 
 @r.get("/dynamic/list", response_model=List[DynamicWithLessonTitle])
+@fastJSON(List[DynamicWithLessonTitle])
 async def getDynamics(
-    db=Depends(deps.getDB),
-    currentUser=Depends(deps.getCurrentUserAndScope),
+    db=Depends(deps.getReadDB),
+    currentUser=Depends(deps.getCurrentPrincipal),
 ):
     user, scope = currentUser
 
-    dynamics = [{
-        **item[0].to_dict(),
-        "lesson_title": item[1].title,
-    } for item in await dynamic.getMultiByUserIdAndScope(db, user.id, scope)]
-
-    return dynamics
+    classId = user.class_id if scope == "student" else None
+    return await dynamic.getMultiByUserIdAndScope(db, user.id, scope, classId)
@@ -2,26 +2,96 @@ from core.config import settings
 from crud.crud_teacher import teacher
 from crud.crud_student import student
 from crud.crud_admin import admin
+from crud.crud_lesson import lesson
+from crud.base import enableMemo, getMemoStats
+from models.lesson import Lesson
+from models.teacher import Teacher
 from core.security import ALGORITHM
+from core.principal import getCachedPrincipal, getClaimsVersion, setCachedPrincipal
+import logging
+import time
+from dataclasses import dataclass
 import jwt
-from fastapi import Depends, HTTPException, status
+from functools import lru_cache
+from typing import Any, Callable, Coroutine, Optional
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.security.utils import get_authorization_scheme_param
 from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
+from redis.asyncio import Redis
 
 from db.redis import SessionRedis
-from db.database import SessionDatabase
+from db.database import SessionDatabase, openReplicaSession
 from db.oss import SessionOSS
 
+logger = logging.getLogger(__name__)
+
 reusableOauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
+scopeCRUDs = {
+    "student": student,
+    "teacher": teacher,
+    "admin": admin,
+}
+
 
-async def getDB():
+async def getRedis():
+    try:
+        r = SessionRedis()
+        yield r
+    finally:
+        await r.close()
+
+
+def _getStickyKey(request: Request) -> Optional[str]:
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        tokenData = parseToken(token)
+    except HTTPException:
+        return None
+    return f"db:sticky:{tokenData.scope}:{tokenData.username}"
+
+
+class ReleaseDBRoute(APIRoute):
+    """
+    接口函数返回后立即关闭本次请求的 session，把连接还给连接池，
+    而不是等到响应（例如 StreamingResponse 的下载流）发送完毕后依赖清理时才释放
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def releaseDBHandler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            finally:
+                for db in getattr(request.state, "db_sessions", []):
+                    await db.close()
+
+        return releaseDBHandler
+
+
+def _trackSession(request: Request, db: AsyncSession) -> None:
+    if not hasattr(request.state, "db_sessions"):
+        request.state.db_sessions = []
+    request.state.db_sessions.append(db)
+
+
+async def getDB(request: Request):
+    # session 在第一次执行语句时才会从连接池检出连接
+    db = SessionDatabase()
+    _trackSession(request, db)
+    enableMemo(db)
+    if settings.SQLALCHEMY_REPLICA_URIS:
+        db.info["sticky_key"] = _getStickyKey(request)
     try:
-        db = SessionDatabase()
         yield db
     except SQLAlchemyError:
         raise HTTPException(
@@ -29,15 +99,35 @@ async def getDB():
             detail="Database error",
         )
     finally:
+        stats = getMemoStats(db)
+        logger.debug("CRUD memo hits=%d misses=%d", stats["hits"], stats["misses"])
         await db.close()
 
 
-async def getRedis():
+async def getReadDB(request: Request, redis: Redis = Depends(getRedis)):
+    """
+    只读接口使用，配置了副本时优先读副本；用户刚写入过或副本不可用时回退到主库
+    """
+    db = None
+    if settings.SQLALCHEMY_REPLICA_URIS:
+        stickyKey = _getStickyKey(request)
+        if not stickyKey or not await redis.exists(stickyKey):
+            db = await openReplicaSession()
+    if db is None:
+        db = SessionDatabase()
+    _trackSession(request, db)
+    enableMemo(db)
     try:
-        r = SessionRedis()
-        yield r
+        yield db
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error",
+        )
     finally:
-        await r.close()
+        stats = getMemoStats(db)
+        logger.debug("CRUD memo hits=%d misses=%d", stats["hits"], stats["misses"])
+        await db.close()
 
 
 async def getOSS():
@@ -48,38 +138,132 @@ async def getOSS():
 class TokenPayload(BaseModel):
     username: str = None
     scope: str = None
+    exp: int = None
+    ver: Optional[int] = None
+    uver: Optional[int] = None
+    name: Optional[str] = None
+    class_id: Optional[int] = None
+
+
+class Principal(BaseModel):
+    id: str
+    name: str
+    class_id: Optional[int] = None
+
+
+@lru_cache(maxsize=settings.ACCESS_TOKEN_CACHE_SIZE)
+def _decodeToken(token: str) -> TokenPayload:
+    # 只缓存签名校验通过的结果，过期时间在每次使用时单独检查
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[ALGORITHM],
+        options={"verify_exp": False}
+    )
+    return TokenPayload(**payload)
 
 
 def parseToken(token: str) -> TokenPayload:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[ALGORITHM]
-        )
-        tokenData = TokenPayload(**payload)
+        tokenData = _decodeToken(token)
     except (ValidationError, jwt.PyJWTError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+    if tokenData.exp is None or tokenData.exp < time.time():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
     return tokenData
 
 
 async def getCurrentUserAndScope(
     db: AsyncSession = Depends(getDB),
+    redis: Redis = Depends(getRedis),
     token: str = Depends(reusableOauth2)
 ):
     tokenData = parseToken(token)
-    if tokenData.scope == "student":
-        user = await student.get(db, id=tokenData.username)
-    elif tokenData.scope == "teacher":
-        user = await teacher.get(db, id=tokenData.username)
-    elif tokenData.scope == "admin":
-        user = await admin.get(db, id=tokenData.username)
+    crudObj = scopeCRUDs.get(tokenData.scope)
+    if crudObj is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
+    # 缓存命中时返回的是未绑定 session 的对象，只用于读取，写入前需重新查库
+    if principal := await getCachedPrincipal(redis, tokenData.scope, tokenData.username):
+        return [crudObj.model(**principal), tokenData.scope]
+
+    user = await crudObj.get(db, id=tokenData.username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    await setCachedPrincipal(redis, tokenData.scope, user.id, user.to_dict())
     return [user, tokenData.scope]
 
 
+async def getCurrentPrincipal(
+    db: AsyncSession = Depends(getDB),
+    redis: Redis = Depends(getRedis),
+    token: str = Depends(reusableOauth2)
+):
+    """
+    只需要身份、姓名与班级的接口使用，token 携带有效声明时只读一次 Redis 中的声明版本号，不访问数据库
+    """
+    tokenData = parseToken(token)
+    # 用户资料被修改或删除后，其声明版本号会递增，旧 token 中的声明不再可信
+    if (
+        tokenData.ver is not None and tokenData.ver == settings.ACCESS_TOKEN_CLAIMS_VERSION
+        and tokenData.uver == await getClaimsVersion(redis, tokenData.scope, tokenData.username)
+    ):
+        return [
+            Principal(
+                id=tokenData.username,
+                name=tokenData.name,
+                class_id=tokenData.class_id
+            ),
+            tokenData.scope
+        ]
+    return await getCurrentUserAndScope(db, redis, token)
+
+
+@dataclass
+class LessonContext:
+    user: Any
+    scope: str
+    lesson: Lesson
+    teacher: Teacher
+
+
+async def getLessonContext(
+    lesson_id: int,
+    db: AsyncSession = Depends(getDB),
+    currentUser=Depends(getCurrentPrincipal),
+) -> LessonContext:
+    """
+    一次联表查询取得课程、授课教师以及当前用户在课程中的身份
+    """
+    user, scope = currentUser
+    row = await lesson.getWithTeacherAndRelation(
+        db, lesson_id, user.class_id if scope == "student" else None
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+
+    l, t, relationId = row
+    if scope == "teacher":
+        if l.teacher_id != user.id:
+            raise HTTPException(
+                status_code=403, detail="You are not the teacher of this lesson")
+    elif scope == "student":
+        if relationId is None:
+            raise HTTPException(
+                status_code=403, detail="You are not the student of this lesson")
+    else:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    return LessonContext(user=user, scope=scope, lesson=l, teacher=t)
+
+
 async def isAdmin(token: str = Depends(reusableOauth2)):
     if parseToken(token).scope != "admin":
         raise HTTPException(status_code=403, detail="Permission denied")
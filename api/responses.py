@@ -0,0 +1,116 @@
+import functools
+from collections.abc import Mapping
+from datetime import date, datetime, time
+from typing import Any, Callable, Dict, Type, Union, get_args, get_origin
+
+import ujson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"{value!r} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return ujson.dumps(content, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+_extractors: Dict[Any, Callable[[Any], Any]] = {}
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _toBool(value: Any) -> Any:
+    # TINYINT 列查出来是 0 / 1，与 pydantic 的校验结果保持一致
+    return value if value is None else bool(value)
+
+
+def _compileModel(model: Type[BaseModel]) -> Callable[[Any], Any]:
+    fields = [
+        (field.name, field.alias, field.default, getExtractor(field.outer_type_))
+        for field in model.__fields__.values()
+    ]
+
+    def extract(obj: Any) -> Any:
+        if obj is None:
+            return None
+        if isinstance(obj, Mapping):
+            get = obj.get
+            return {
+                alias: value if value is None else extractor(value)
+                for name, alias, default, extractor in fields
+                for value in (get(name, default),)
+            }
+        return {
+            alias: value if value is None else extractor(value)
+            for name, alias, default, extractor in fields
+            for value in (getattr(obj, name, default),)
+        }
+
+    return extract
+
+
+def _compileSequence(itemExtractor: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    if itemExtractor is _identity:
+        return list
+
+    def extract(items: Any) -> Any:
+        return [item if item is None else itemExtractor(item) for item in items]
+
+    return extract
+
+
+def getExtractor(annotation: Any) -> Callable[[Any], Any]:
+    """
+    为响应模型（或其字段类型）预编译一个提取函数，把 ORM 对象 / 行映射 / 字典直接转换为可序列化的结构
+    只做取值，不做校验，只能用于可信的数据库数据
+    """
+    if annotation in _extractors:
+        return _extractors[annotation]
+
+    origin = get_origin(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        extractor = _compileModel(annotation)
+    elif isinstance(annotation, type) and issubclass(annotation, bool):
+        extractor = _toBool
+    elif origin in (list, tuple, set, frozenset):
+        args = get_args(annotation)
+        extractor = _compileSequence(getExtractor(args[0]) if args else _identity)
+    elif origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        extractor = getExtractor(args[0]) if len(args) == 1 else _identity
+    else:
+        extractor = _identity
+
+    _extractors[annotation] = extractor
+    return extractor
+
+
+def fastJSON(responseModel: Any):
+    """
+    路由装饰器：跳过 response_model 的重新校验和 jsonable_encoder，按预编译的提取函数直接用 ujson 序列化
+    路由上的 response_model 保持不变，OpenAPI 文档不受影响；装饰器放在路由装饰器之下
+
+        @r.get("/list", response_model=List[schemas.Class])
+        @fastJSON(List[schemas.Class])
+        async def getList(...):
+    """
+    extractor = getExtractor(responseModel)
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            return FastJSONResponse(extractor(result))
+        return wrapper
+
+    return decorator
@@ -0,0 +1,83 @@
+"""
+模型转换微基准
+
+对比逐次遍历 __table__.columns / jsonable_encoder 与预编译转换器在 1 万行上的耗时，不需要数据库。
+
+    python -m benchmarks.converters [rows]
+"""
+import sys
+import time
+from typing import Any, Callable, List
+
+from fastapi.encoders import jsonable_encoder
+
+from models.dynamic import Dynamic
+from models.task import Task
+from schemas.dynamic import DynamicCreate
+from schemas.task import TaskUpdate
+
+ROWS = 10000
+REPEAT = 5
+
+
+def timeit(fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, before: Callable[[], Any], after: Callable[[], Any]) -> None:
+    assert before() == after(), name
+    old, new = timeit(before), timeit(after)
+    print(f"{name:<12} {old * 1000:9.2f} ms {new * 1000:9.2f} ms {old / new:7.2f}x")
+
+
+def walkColumns(obj) -> dict:
+    # 原 to_dict 的实现
+    return {c.name: getattr(obj, c.name, None) for c in obj.__table__.columns}
+
+
+def main(rows: int) -> None:
+    tasks: List[Task] = [
+        Task(id=i, lesson_id=i % 50, title=f"task {i}", description="d" * 64,
+             created_time=1700000000 + i, deadline=1800000000 + i)
+        for i in range(rows)
+    ]
+    dynamics: List[Dynamic] = [
+        Dynamic(id=i, lesson_id=i % 50, content="c" * 64, created_time=1700000000 + i,
+                scope="student", user_id="2020000001")
+        for i in range(rows)
+    ]
+    creates = [
+        DynamicCreate(lesson_id=i % 50, content="c" * 64, created_time=1700000000 + i,
+                      scope="student", user_id="2020000001")
+        for i in range(rows)
+    ]
+    update = TaskUpdate(title="t", description="d", deadline=1900000000)
+    updateData = update.dict(exclude_unset=True)
+
+    print(f"{rows} rows, best of {REPEAT}")
+    print(f"{'':<12} {'before':>12} {'after':>12} {'speedup':>8}")
+    report(
+        "to_dict",
+        lambda: [walkColumns(t) for t in tasks] + [walkColumns(d) for d in dynamics],
+        lambda: [t.to_dict() for t in tasks] + [d.to_dict() for d in dynamics],
+    )
+    report(
+        "create",
+        lambda: [jsonable_encoder(obj) for obj in creates],
+        lambda: [obj.dict() for obj in creates],
+    )
+    # update 原先用 jsonable_encoder(db_obj) 取得字段名，再与更新数据求交
+    report(
+        "update",
+        lambda: [[f for f in jsonable_encoder(t) if f in updateData] for t in tasks],
+        lambda: [[f for f in updateData if f in Task.__column_set__] for t in tasks],
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
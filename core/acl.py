@@ -0,0 +1,75 @@
+from typing import Awaitable, Callable, Iterable, List, Union
+
+from redis.exceptions import WatchError
+
+from core.config import settings
+from db.redis import SessionRedis
+
+
+# 课程 id 从 1 开始，集合中额外放入 0 以区分“未缓存”和“没有任何课程”
+_PLACEHOLDER_LESSON_ID = 0
+
+
+def _getLessonsKey(owner: str, owner_id: Union[str, int]) -> str:
+    return f"acl:{owner}:{owner_id}:lessons"
+
+
+def _getGenerationKey(owner: str, owner_id: Union[str, int]) -> str:
+    return f"acl:{owner}:{owner_id}:generation"
+
+
+async def hasLesson(
+    owner: str,
+    owner_id: Union[str, int],
+    lesson_id: int,
+    loader: Callable[[], Awaitable[List[int]]]
+) -> bool:
+    key = _getLessonsKey(owner, owner_id)
+    generationKey = _getGenerationKey(owner, owner_id)
+    async with SessionRedis() as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            isMember, exists, generation = await pipe.sismember(
+                key, lesson_id
+            ).exists(key).get(generationKey).execute()
+        if exists:
+            return bool(isMember)
+
+        lessonIds = await loader()
+        # 查库期间如果发生了失效，代数会变化，此时放弃回填，避免把旧的集合写回缓存
+        async with redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(generationKey)
+                if await pipe.get(generationKey) == generation:
+                    pipe.multi()
+                    pipe.delete(key).sadd(
+                        key, _PLACEHOLDER_LESSON_ID, *lessonIds
+                    ).expire(
+                        key, settings.LESSON_ACL_EXPIRE_SECONDS
+                    )
+                    await pipe.execute()
+            except WatchError:
+                pass
+    return lesson_id in lessonIds
+
+
+async def _invalidateLessons(owner: str, owner_ids: Iterable[Union[str, int]]):
+    owner_ids = set(owner_ids)
+    if len(owner_ids) == 0:
+        return
+    async with SessionRedis() as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*[_getLessonsKey(owner, owner_id) for owner_id in owner_ids])
+            # 递增代数让正在进行中的回填失效；代数只需比一次回填存活得久
+            for owner_id in owner_ids:
+                generationKey = _getGenerationKey(owner, owner_id)
+                pipe.incr(generationKey)
+                pipe.expire(generationKey, settings.LESSON_ACL_EXPIRE_SECONDS)
+            await pipe.execute()
+
+
+async def invalidateTeacherLessons(teacher_ids: Iterable[str]):
+    await _invalidateLessons("teacher", teacher_ids)
+
+
+async def invalidateClassLessons(class_ids: Iterable[int]):
+    await _invalidateLessons("class", class_ids)
@@ -7,6 +7,14 @@ class Settings(BaseSettings):
     API_V1_STR = "/api/v1"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # 开启后 token 内携带姓名、班级等信息，鉴权时不再查库
+    # 用户资料被修改或删除时会递增该用户的声明版本号，其已签发的 token 回退到查库
+    # 调整 ACCESS_TOKEN_CLAIMS_VERSION 可使所有已签发的 token 回退到查库
+    ACCESS_TOKEN_WITH_CLAIMS: bool = False
+    ACCESS_TOKEN_CLAIMS_VERSION: int = 1
+    ACCESS_TOKEN_CACHE_SIZE: int = 4096
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PROCESSES: Optional[int] = None
 
     BACKEND_CORS_ORIGINS: List[str] = []
 
@@ -32,6 +40,34 @@ class Settings(BaseSettings):
             return v
         return f"mysql+aiomysql://{values['MYSQL_USER']}:{values['MYSQL_PASSWORD']}@{values['MYSQL_SERVER']}/{values['MYSQL_DB']}?charset=utf8mb4"
 
+    # 只读副本，逗号分隔（也可写成 JSON 列表）；为空时所有请求都走主库
+    SQLALCHEMY_REPLICA_URIS: List[str] = []
+
+    @validator("SQLALCHEMY_REPLICA_URIS", pre=True)
+    def assembleReplicaURIs(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        elif isinstance(v, (list, str)):
+            return v
+        raise ValueError(v)
+
+    # 用户写入后在这段时间内的读请求仍走主库，保证能读到自己的写入
+    DB_REPLICA_STICKY_SECONDS: int = 5
+    # 副本连接失败后暂停使用的时间
+    DB_REPLICA_RETRY_SECONDS: int = 30
+
+    # 同一请求内同一条语句执行次数达到该值时视为疑似 N+1 查询
+    DB_N_PLUS_ONE_THRESHOLD: int = 5
+    # 响应头中暴露每个请求的 SQL 条数与耗时，只在开发和测试环境开启
+    DB_QUERY_STATS_HEADERS: bool = False
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    # 需小于 MySQL 的 wait_timeout，避免使用已被服务端断开的连接
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_PRE_PING: bool = True
+
     REDIS_SERVER: str
     REDIS_USER: str
     REDIS_PASSWORD: str
@@ -44,6 +80,17 @@ class Settings(BaseSettings):
             return v
         return f"redis://{values['REDIS_USER']}:{values['REDIS_PASSWORD']}@{values['REDIS_SERVER']}/{values['REDIS_DB']}"
 
+    PRINCIPAL_CACHE_EXPIRE_SECONDS: int = 60
+    LESSON_ACL_EXPIRE_SECONDS: int = 300
+    LIST_TOTAL_EXPIRE_SECONDS: int = 300
+
+    # 登录限流的令牌桶参数，RATE 为每秒补充的令牌数
+    # 校园网出口通常共用少量 IP，IP 维度的桶需要放宽
+    LOGIN_THROTTLE_USER_CAPACITY: int = 5
+    LOGIN_THROTTLE_USER_RATE: float = 0.1
+    LOGIN_THROTTLE_IP_CAPACITY: int = 200
+    LOGIN_THROTTLE_IP_RATE: float = 20
+
     S3_PUBLIC_ENDPOINT: str
     S3_API_ENDPOINT: str
     S3_API_ACCESS_KEY: str
@@ -52,9 +99,22 @@ class Settings(BaseSettings):
     FIRST_ADMIN_ID: str
     FIRST_ADMIN_PASSWORD: str
 
+    # 建表、创建初始管理员和存储桶，可重复执行，多个 worker 同时启动时由 Redis 锁串行化
+    # 直接运行 `python main.py` / `uvicorn main:app` 时在启动时执行；Docker 镜像由 prestart.sh 执行
+    # `python -m db.init_db` 一次，并通过环境变量关闭此项，worker 启动时只做连通性检查
+    PROVISION_ON_STARTUP: bool = True
+    PROVISION_LOCK_TIMEOUT: int = 120
+
     class Config:
         case_sensitive = True
         env_file = ".env"
 
+        @classmethod
+        def parse_env_var(cls, field_name: str, raw_val: str) -> Any:
+            # 列表类型的环境变量默认按 JSON 解析，副本地址按注释约定的逗号分隔写法原样交给校验器拆分
+            if field_name == "SQLALCHEMY_REPLICA_URIS" and not raw_val.lstrip().startswith("["):
+                return raw_val
+            return cls.json_loads(raw_val)
+
 
 settings = Settings()
@@ -2,8 +2,6 @@ import time
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud.crud_dynamic import dynamic
-from crud.crud_class import class_
-from crud.crud_student import student
 
 
 async def sendDynamicToStudent(
@@ -41,11 +39,5 @@ async def boardcastDynamicToLesson(
     lesson_id: int,
     content: str,
 ):
-    class_ids = [theClass.id for theClass in await class_.getMultiByLessonId(db, lesson_id)]
-    student_ids = []
-    for class_id in class_ids:
-        student_ids += [student.id for student in await student.getMultiByClassId(db, class_id)]
-    await dynamic.insertMultiByStudentIds(
-        db, student_ids, lesson_id, content,
-        int(time.time()), "student"
-    )
+    # 只写一行课程广播，学生读取动态时再按所在班级的课程合并
+    await dynamic.createLessonBroadcast(db, lesson_id, content, int(time.time()))
@@ -0,0 +1,151 @@
+import csv
+import io
+import re
+import zipfile
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Type
+
+from fastapi import UploadFile
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import security
+from crud.base import CRUDBase
+from crud.crud_class import class_
+from crud.crud_student import student
+from crud.crud_teacher import teacher
+from schemas.student import StudentCreate
+from schemas.teacher import TeacherCreate
+
+
+IMPORT_BATCH_SIZE = 1000
+
+_OPTIONAL_FIELDS = ("email", "phone", "introduction", "avatar")
+
+_CJK = re.compile("[\u4e00-\u9fff]")
+
+
+class ImportFileError(Exception):
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+def _decodeCsv(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        # 出错位置之前已按 UTF-8 正常解出汉字，说明文件本身是 UTF-8、只是中间有损坏，不再按其他编码猜测
+        if _CJK.search(data[:e.start].decode("utf-8-sig")):
+            raise ImportFileError(f"Invalid UTF-8 byte at offset {e.start}")
+    # Windows 中文版 Excel 导出的 CSV 默认是 GBK
+    try:
+        return data.decode("gb18030")
+    except UnicodeDecodeError as e:
+        raise ImportFileError(f"Unable to decode CSV file as UTF-8 or GBK (offset {e.start})")
+
+
+def readUploadRows(file: UploadFile) -> List[Dict[str, Any]]:
+    """
+    在写入数据库之前完整解码并解析整个文件，文件层面的错误不会导致只导入了前面一部分
+    """
+    ext = file.filename.split(".")[-1].lower()
+    if ext == "csv":
+        text = _decodeCsv(file.file.read())
+        try:
+            return list(csv.DictReader(io.StringIO(text, newline="")))
+        except csv.Error as e:
+            raise ImportFileError(f"Unable to parse CSV file: {e}")
+    elif ext == "xlsx":
+        try:
+            workbook = load_workbook(file.file, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError):
+            raise ImportFileError("Unable to parse XLSX file")
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(item).strip() if item is not None else "" for item in next(rows, [])]
+            return [dict(zip(header, row)) for row in rows]
+        finally:
+            workbook.close()
+    else:
+        raise ImportFileError("Only .csv and .xlsx files are supported")
+
+
+def _formatValidationError(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+async def _importAccounts(
+    db: AsyncSession,
+    crudObj: CRUDBase,
+    schema: Type[BaseModel],
+    rows: Iterable[Dict[str, Any]],
+    checkBatch: Optional[Callable[[AsyncSession, List[BaseModel]], Awaitable[Dict[int, str]]]] = None,
+) -> dict:
+    total = 0
+    created = 0
+    errors = []
+    seenIds = set()
+    # 表头占第一行，数据行号从 2 开始
+    lines = enumerate(rows, start=2)
+
+    while batch := list(islice(lines, IMPORT_BATCH_SIZE)):
+        total += len(batch)
+        parsed = []
+        for line, row in batch:
+            data = {
+                k.strip(): "" if v is None else str(v).strip()
+                for k, v in row.items() if k
+            }
+            for field in _OPTIONAL_FIELDS:
+                data.setdefault(field, "")
+            try:
+                obj = schema(**data)
+            except ValidationError as e:
+                errors.append({"row": line, "id": data.get("id"), "detail": _formatValidationError(e)})
+                continue
+            if obj.id in seenIds:
+                errors.append({"row": line, "id": obj.id, "detail": "Duplicate id in file"})
+                continue
+            seenIds.add(obj.id)
+            parsed.append((line, obj))
+
+        existingIds = await crudObj.getExistingIds(db, [obj.id for _, obj in parsed])
+        batchErrors = await checkBatch(db, [obj for _, obj in parsed]) if checkBatch else {}
+        valid = []
+        for i, (line, obj) in enumerate(parsed):
+            if obj.id in existingIds:
+                errors.append({"row": line, "id": obj.id, "detail": "Id already exists"})
+            elif i in batchErrors:
+                errors.append({"row": line, "id": obj.id, "detail": batchErrors[i]})
+            else:
+                valid.append(obj)
+
+        # 初始密码与账号相同
+        hashedPasswords = await security.getPasswordHashesInProcessPool([obj.id for obj in valid])
+        created += await crudObj.createMany(db, [{
+            **obj.dict(),
+            "hashed_password": hashedPassword,
+        } for obj, hashedPassword in zip(valid, hashedPasswords)], ignore=True)
+
+    errors.sort(key=lambda item: item["row"])
+    return {"total": total, "created": created, "errors": errors}
+
+
+async def _checkStudentClasses(db: AsyncSession, objs: List[StudentCreate]) -> Dict[int, str]:
+    classIds = await class_.getExistingIds(db, list({obj.class_id for obj in objs}))
+    return {
+        i: f"Class {obj.class_id} not found"
+        for i, obj in enumerate(objs) if obj.class_id not in classIds
+    }
+
+
+async def importStudents(db: AsyncSession, rows: Iterable[Dict[str, Any]]) -> dict:
+    return await _importAccounts(db, student, StudentCreate, rows, _checkStudentClasses)
+
+
+async def importTeachers(db: AsyncSession, rows: Iterable[Dict[str, Any]]) -> dict:
+    return await _importAccounts(db, teacher, TeacherCreate, rows)
@@ -0,0 +1,56 @@
+from typing import Optional, Union
+
+import ujson
+from redis.asyncio import Redis
+
+from core.config import settings
+
+
+def _getPrincipalKey(scope: str, user_id: Union[str, int]) -> str:
+    return f"principal:{scope}:{user_id}"
+
+
+def _getClaimsVersionKey(scope: str, user_id: Union[str, int]) -> str:
+    return f"principal:{scope}:{user_id}:claims-version"
+
+
+async def getClaimsVersion(redis: Redis, scope: str, user_id: Union[str, int]) -> int:
+    """
+    用户的声明版本号，签发携带声明的 token 时写入，鉴权时与 token 中的值比较
+    """
+    return int(await redis.get(_getClaimsVersionKey(scope, user_id)) or 0)
+
+
+async def getCachedPrincipal(redis: Redis, scope: str, user_id: Union[str, int]) -> Optional[dict]:
+    principalStr = await redis.get(_getPrincipalKey(scope, user_id))
+    if principalStr is None:
+        return None
+
+    try:
+        return ujson.loads(principalStr)
+    except ujson.JSONDecodeError:
+        await invalidatePrincipal(redis, scope, user_id)
+        return None
+
+
+async def setCachedPrincipal(redis: Redis, scope: str, user_id: Union[str, int], principal: dict):
+    # 密码哈希不进入缓存，需要校验密码的地方请直接查库
+    data = {k: v for k, v in principal.items() if k != "hashed_password"}
+    await redis.set(
+        _getPrincipalKey(scope, user_id),
+        ujson.dumps(data),
+        ex=settings.PRINCIPAL_CACHE_EXPIRE_SECONDS
+    )
+    return
+
+
+async def invalidatePrincipal(redis: Redis, scope: str, user_id: Union[str, int]):
+    # 同时递增声明版本号，使该用户已签发的携带声明的 token 回退到查库
+    # 版本号只需存活到这些 token 过期为止
+    versionKey = _getClaimsVersionKey(scope, user_id)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(_getPrincipalKey(scope, user_id))
+        pipe.incr(versionKey)
+        pipe.expire(versionKey, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        await pipe.execute()
+    return
@@ -1,4 +1,8 @@
+import asyncio
+import os
 import jwt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 
@@ -8,6 +12,19 @@ pwdContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 ALGORITHM = "HS256"
 
+# bcrypt 计算期间会释放 GIL，放到独立线程池中执行，避免阻塞事件循环
+passwordHashExecutor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    thread_name_prefix="password-hash",
+)
+# 批量导入等场景使用的进程池，按需创建
+passwordHashProcessPool = None
+passwordHashStats = {
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "completed": 0,
+}
+
 
 def getPasswordHash(password: str) -> str:
     return pwdContext.hash(password)
@@ -17,6 +34,64 @@ def verifyPassword(plainPassword: str, hashedPassword: str) -> bool:
     return pwdContext.verify(plainPassword, hashedPassword)
 
 
+async def _runPasswordHashJob(func, *args):
+    loop = asyncio.get_running_loop()
+    passwordHashStats["in_flight"] += 1
+    passwordHashStats["max_in_flight"] = max(
+        passwordHashStats["max_in_flight"], passwordHashStats["in_flight"]
+    )
+    try:
+        return await loop.run_in_executor(passwordHashExecutor, func, *args)
+    finally:
+        passwordHashStats["in_flight"] -= 1
+        passwordHashStats["completed"] += 1
+
+
+async def getPasswordHashAsync(password: str) -> str:
+    return await _runPasswordHashJob(getPasswordHash, password)
+
+
+async def verifyPasswordAsync(plainPassword: str, hashedPassword: str) -> bool:
+    return await _runPasswordHashJob(verifyPassword, plainPassword, hashedPassword)
+
+
+def _getPasswordHashes(passwords: List[str]) -> List[str]:
+    return [getPasswordHash(password) for password in passwords]
+
+
+async def getPasswordHashesInProcessPool(passwords: List[str]) -> List[str]:
+    global passwordHashProcessPool
+    if len(passwords) == 0:
+        return []
+    if passwordHashProcessPool is None:
+        passwordHashProcessPool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_MAX_PROCESSES
+        )
+
+    processes = settings.PASSWORD_HASH_MAX_PROCESSES or os.cpu_count() or 1
+    chunkSize = -(-len(passwords) // processes)
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(
+            passwordHashProcessPool,
+            _getPasswordHashes,
+            passwords[i:i + chunkSize]
+        ) for i in range(0, len(passwords), chunkSize)
+    ])
+    return [hashed for chunk in results for hashed in chunk]
+
+
+def getPasswordHashStats() -> dict:
+    inFlight = passwordHashStats["in_flight"]
+    return {
+        "max_workers": settings.PASSWORD_HASH_MAX_WORKERS,
+        "running": min(inFlight, settings.PASSWORD_HASH_MAX_WORKERS),
+        "queued": max(0, inFlight - settings.PASSWORD_HASH_MAX_WORKERS),
+        "max_in_flight": passwordHashStats["max_in_flight"],
+        "completed": passwordHashStats["completed"],
+    }
+
+
 def createAccessToken(*, data: dict, expiresDelta: timedelta = None):
     toEncode = data.copy()
     if expiresDelta:
@@ -0,0 +1,87 @@
+from redis.asyncio import Redis
+
+from core.config import settings
+
+
+# KEYS 为各个令牌桶，ARGV 依次为每个桶的容量与每秒补充令牌数
+# 所有桶都有令牌时才同时扣减，返回 {是否放行, 需等待的毫秒数, 首个耗尽的桶序号}
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+local tokens = {}
+local wait = 0
+local limited = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'time')
+    local t = tonumber(bucket[1])
+    local last = tonumber(bucket[2])
+    if t == nil or last == nil then
+        t = capacity
+        last = now
+    end
+    t = math.min(capacity, t + math.max(0, now - last) * rate)
+    tokens[i] = t
+    if t < 1 then
+        wait = math.max(wait, (1 - t) / rate)
+        if limited == 0 then
+            limited = i
+        end
+    end
+end
+
+local allowed = 0
+if limited == 0 then
+    allowed = 1
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tokens[i] - allowed, 'time', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+
+return {allowed, math.ceil(wait * 1000), limited}
+"""
+
+LOGIN_THROTTLE_REJECTED_KEY = "throttle:login:rejected"
+
+
+class LoginThrottledError(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+
+async def consumeLoginToken(redis: Redis, username: str, ip: str):
+    script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+    allowed, waitMs, limited = await script(
+        keys=[
+            f"throttle:login:user:{username}",
+            f"throttle:login:ip:{ip}",
+        ],
+        args=[
+            settings.LOGIN_THROTTLE_USER_CAPACITY,
+            settings.LOGIN_THROTTLE_USER_RATE,
+            settings.LOGIN_THROTTLE_IP_CAPACITY,
+            settings.LOGIN_THROTTLE_IP_RATE,
+        ]
+    )
+    if allowed:
+        return
+
+    await redis.hincrby(
+        LOGIN_THROTTLE_REJECTED_KEY,
+        "user" if limited == 1 else "ip",
+        1
+    )
+    raise LoginThrottledError(-(-waitMs // 1000))
+
+
+async def getLoginThrottleStats(redis: Redis) -> dict:
+    counters = await redis.hgetall(LOGIN_THROTTLE_REJECTED_KEY)
+    stats = {"user": 0, "ip": 0}
+    for k, v in counters.items():
+        stats[k.decode() if isinstance(k, bytes) else k] = int(v)
+    return stats
@@ -0,0 +1,43 @@
+from typing import Awaitable, Callable, Iterable, Optional
+
+from core.config import settings
+from db.redis import SessionRedis
+
+
+def _getVersionKey(table: str) -> str:
+    return f"total:{table}:version"
+
+
+def _getTotalKey(table: str, version: int, keyword: str) -> str:
+    return f"total:{table}:{version}:{keyword}"
+
+
+async def getCachedTotal(
+    table: str,
+    keyword: Optional[str],
+    loader: Callable[[], Awaitable[int]]
+) -> int:
+    """
+    按 (表, 关键字) 缓存列表总数；表发生写入时版本号递增，旧版本的缓存自然失效
+    """
+    async with SessionRedis() as redis:
+        version = int(await redis.get(_getVersionKey(table)) or 0)
+        key = _getTotalKey(table, version, keyword or "")
+        total = await redis.get(key)
+        if total is not None:
+            return int(total)
+
+        total = await loader()
+        await redis.set(key, total, ex=settings.LIST_TOTAL_EXPIRE_SECONDS)
+    return total
+
+
+async def invalidateTotals(tables: Iterable[str]):
+    tables = set(tables)
+    if len(tables) == 0:
+        return
+    async with SessionRedis() as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            for table in tables:
+                pipe.incr(_getVersionKey(table))
+            await pipe.execute()
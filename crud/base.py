@@ -1,16 +1,101 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Sequence, Set, Tuple, Type, TypeVar, Union
 
-from fastapi.encoders import jsonable_encoder
+import ujson
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Insert, RowMapping, delete, event, func, insert, null, select, text, update
+from sqlalchemy.dialects.mysql import insert as mysqlInsert
+from sqlalchemy.dialects.sqlite import insert as sqliteInsert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from core.totals import getCachedTotal
 from models.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# 批量写入时每条语句携带的最大行数
+BULK_BATCH_SIZE = 1000
+
+
+def encodeCursor(rank: Optional[float], id: Any) -> str:
+    """
+    将最后一行的排序键 (相关度, 主键) 编码为不透明的游标，不按相关度排序时 rank 为 None
+    相关度以 float.hex() 保存，解码后与数据库中的值逐位相等，游标定位时的等值比较才可靠
+    """
+    if rank is not None:
+        rank = float(rank).hex()
+    return base64.urlsafe_b64encode(ujson.dumps([rank, id]).encode()).decode().rstrip("=")
+
+
+def decodeCursor(cursor: str) -> Tuple[Optional[float], Any]:
+    """
+    游标格式不合法时抛出 ValueError
+    """
+    try:
+        rank, id = ujson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if rank is not None:
+            rank = float.fromhex(rank)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    # bool 是 int 的子类，需要单独排除
+    if isinstance(id, bool) or not isinstance(id, (str, int)):
+        raise ValueError("Invalid cursor")
+    return rank, id
+
+
+def insertIgnore(table) -> Insert:
+    """
+    INSERT IGNORE，按方言生成对应的写法（SQLite 为 INSERT OR IGNORE）
+    """
+    return insert(table).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+
+
+def enableMemo(db: AsyncSession) -> None:
+    """
+    为 session 开启请求级别的读缓存，由 getDB 在每个请求开始时调用
+    """
+    db.info["memo"] = {}
+    db.info["memo_stats"] = {"hits": 0, "misses": 0}
+
+
+def getMemoStats(db: AsyncSession) -> Optional[Dict[str, int]]:
+    return db.info.get("memo_stats")
+
+
+async def memoize(
+    db: AsyncSession,
+    key: Hashable,
+    loader: Callable[[], Awaitable[Any]],
+    memo: bool = True
+) -> Any:
+    cache = db.info.get("memo")
+    if not memo or cache is None:
+        return await loader()
+
+    stats = db.info["memo_stats"]
+    if key in cache:
+        stats["hits"] += 1
+        return cache[key]
+    stats["misses"] += 1
+    cache[key] = await loader()
+    return cache[key]
+
+
+# 同一 session 内发生任何写入后清空读缓存，避免读到旧数据
+@event.listens_for(Session, "do_orm_execute")
+def _clearMemoOnExecute(orm_execute_state) -> None:
+    if not orm_execute_state.is_select and "memo" in orm_execute_state.session.info:
+        orm_execute_state.session.info["memo"].clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _clearMemoOnFlush(session, flush_context) -> None:
+    if "memo" in session.info:
+        session.info["memo"].clear()
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
@@ -24,9 +109,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
-    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
-        query = select(self.model).where(self.model.id == id)
-        return (await db.execute(query)).scalars().first()
+    async def get(self, db: AsyncSession, id: Any, memo: bool = True) -> Optional[ModelType]:
+        async def loader():
+            query = select(self.model).where(self.model.id == id)
+            return (await db.execute(query)).scalars().first()
+        return await memoize(db, (self.model, "get", id), loader, memo)
 
     async def getMulti(
         self, db: AsyncSession, *, offset: int = 0, limit: int = 100
@@ -34,8 +121,115 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         query = select(self.model).offset(offset).limit(limit)
         return (await db.execute(query)).scalars().all()
 
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        """
+        由子类给出关键字搜索的 (过滤条件, 相关度)，相关度为 None 时按主键排序；默认不支持搜索
+        """
+        return [], None
+
+    async def getApproximateCount(self, db: AsyncSession) -> Optional[int]:
+        """
+        从 information_schema 读取表的估算行数，仅 MySQL 可用，其他数据库返回 None
+        InnoDB 的统计值可能与实际行数有较大偏差，只适合用于展示
+        """
+        if db.bind.dialect.name != "mysql":
+            return None
+        query = text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ).bindparams(table=self.model.__tablename__)
+        return (await db.execute(query)).scalar()
+
+    async def getMultiByOptionalKeyword(
+        self,
+        db: AsyncSession,
+        keyword: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 10,
+        after: Optional[str] = None,
+        approximate: bool = False,
+        columns: Optional[List[str]] = None
+    ) -> Tuple[List[Union[ModelType, Dict[str, Any]]], int, bool, Optional[str]]:
+        """
+        按相关度（若有）和主键排序分页，返回 (当前页, 总数, 总数是否精确, 下一页游标)
+        传入 after 时以游标定位（keyset 分页），此时忽略 offset，深翻页与首页代价相同
+        总数按 (表, 关键字) 缓存，表有写入时失效；无关键字且 approximate 为真时改用表统计信息估算
+        传入 columns 时只查询这些列，当前页为字典列表而非 ORM 对象
+        """
+        where, rank = self.keywordSearch(keyword) if keyword else ([], None)
+
+        if columns is not None:
+            columns = ["id", *(c for c in columns if c != "id")]
+            targets = [self.model.__table__.c[c] for c in columns]
+        else:
+            targets = [self.model]
+        if rank is None:
+            paginateQuery = select(null(), *targets).order_by(self.model.id)
+        else:
+            paginateQuery = select(rank, *targets).order_by(rank.desc(), self.model.id)
+        paginateQuery = paginateQuery.where(*where)
+        if after is None:
+            paginateQuery = paginateQuery.offset(offset)
+        else:
+            lastRank, lastId = decodeCursor(after)
+            if rank is None or lastRank is None:
+                paginateQuery = paginateQuery.where(self.model.id > lastId)
+            else:
+                paginateQuery = paginateQuery.where(
+                    (rank < lastRank) | ((rank == lastRank) & (self.model.id > lastId))
+                )
+
+        # 多取一行以判断是否还有下一页
+        rows = (await db.execute(paginateQuery.limit(limit + 1))).all()
+        if columns is not None:
+            items = [dict(zip(columns, row[1:])) for row in rows]
+            lastId = items[limit - 1]["id"] if len(rows) > limit else None
+        else:
+            items = [row[1] for row in rows]
+            lastId = items[limit - 1].id if len(rows) > limit else None
+        nextCursor = encodeCursor(rows[limit - 1][0], lastId) if len(rows) > limit else None
+
+        total = await self.getApproximateCount(db) if approximate and not where else None
+        if total is not None:
+            return items[:limit], total, False, nextCursor
+
+        async def loader():
+            totalQuery = select(func.count()).select_from(self.model).where(*where)
+            return (await db.execute(totalQuery)).scalar()
+
+        total = await getCachedTotal(self.model.__tablename__, keyword, loader)
+        return items[:limit], total, True, nextCursor
+
+    def columnsFor(self, schema: Type[BaseModel]) -> List[str]:
+        """
+        响应模型中与表字段同名的列
+        """
+        return [name for name in schema.__fields__ if name in self.model.__column_set__]
+
+    async def selectRows(
+        self,
+        db: AsyncSession,
+        columns: Optional[List[Union[str, ColumnElement]]] = None,
+        where: Sequence[ColumnElement[bool]] = ()
+    ) -> Sequence[RowMapping]:
+        """
+        只读快速路径：只查询需要的列，返回行映射，不构造 ORM 对象也不进入 identity map
+        columns 可以是列名或列表达式，默认为表的所有列
+        """
+        table = self.model.__table__
+        if columns is None:
+            columns = list(table.columns)
+        query = select(*(table.columns[c] if isinstance(c, str) else c for c in columns)).where(*where)
+        return (await db.execute(query)).mappings().all()
+
+    async def getExistingIds(self, db: AsyncSession, ids: List[Any]) -> Set[Any]:
+        if len(ids) == 0:
+            return set()
+        query = select(self.model.id).where(self.model.id.in_(ids))
+        return set((await db.execute(query)).scalars().all())
+
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
         await db.commit()
@@ -49,19 +243,120 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        columns = self.model.__column_set__
+        for field, value in update_data.items():
+            if field in columns:
+                setattr(db_obj, field, value)
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
         return db_obj
 
+    def _toRows(self, objs_in: List[Union[CreateSchemaType, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [obj if isinstance(obj, dict) else obj.dict() for obj in objs_in]
+
+    async def _executeInBatches(self, db: AsyncSession, query, rows: List[Dict[str, Any]], batch_size: int) -> int:
+        total = 0
+        for i in range(0, len(rows), batch_size):
+            total += (await db.execute(query, rows[i:i + batch_size])).rowcount
+        await db.commit()
+        return total
+
+    async def createMany(
+        self,
+        db: AsyncSession,
+        objs_in: List[Union[CreateSchemaType, Dict[str, Any]]],
+        *,
+        ignore: bool = False,
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        """
+        使用 Core executemany 批量插入，不构造 ORM 对象，返回插入的行数
+        """
+        if len(objs_in) == 0:
+            return 0
+        query = insertIgnore(self.model.__table__) if ignore else insert(self.model.__table__)
+        return await self._executeInBatches(db, query, self._toRows(objs_in), batch_size)
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        objs_in: List[Union[CreateSchemaType, Dict[str, Any]]],
+        *,
+        update_fields: Optional[List[str]] = None,
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        """
+        INSERT ... ON DUPLICATE KEY UPDATE，默认在冲突时更新除主键外的所有字段
+        SQLite 上使用 INSERT ... ON CONFLICT DO UPDATE，冲突目标同样是任意唯一约束
+        """
+        if len(objs_in) == 0:
+            return 0
+        rows = self._toRows(objs_in)
+        if update_fields is None:
+            update_fields = [
+                c.name for c in self.model.__table__.columns
+                if not c.primary_key and c.name in rows[0]
+            ]
+        if db.bind.dialect.name == "sqlite":
+            query = sqliteInsert(self.model.__table__)
+            query = query.on_conflict_do_update(set_={
+                field: query.excluded[field] for field in update_fields
+            })
+        else:
+            query = mysqlInsert(self.model.__table__)
+            query = query.on_duplicate_key_update({
+                field: query.inserted[field] for field in update_fields
+            })
+        return await self._executeInBatches(db, query, rows, batch_size)
+
+    async def updateMany(
+        self,
+        db: AsyncSession,
+        where: List[ColumnElement[bool]],
+        values: Dict[str, Any]
+    ) -> int:
+        query = update(self.model).where(*where).values(**values)
+        result = await db.execute(query)
+        await db.commit()
+        return result.rowcount
+
+    async def patch(
+        self,
+        db: AsyncSession,
+        id: Any,
+        values: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> int:
+        """
+        直接执行 UPDATE ... WHERE id = ?，无需先查出对象，也不在提交后 refresh，返回匹配的行数
+        values 中带有不同的 id 时会修改主键，外键依赖 ON UPDATE CASCADE 跟随更新
+        """
+        if not isinstance(values, dict):
+            values = values.dict(exclude_unset=True)
+        columns = self.model.__column_set__
+        values = {k: v for k, v in values.items() if k in columns}
+        return await self.updateMany(db, [self.model.id == id], values)
+
+    async def removeMany(
+        self,
+        db: AsyncSession,
+        ids: List[Any],
+        *,
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        total = 0
+        for i in range(0, len(ids), batch_size):
+            query = delete(self.model.__table__).where(
+                self.model.id.in_(ids[i:i + batch_size])
+            )
+            total += (await db.execute(query)).rowcount
+        await db.commit()
+        return total
+
     async def remove(self, db: AsyncSession, *, id: int) -> ModelType:
         obj = await self.get(db, id=id)
         await db.delete(obj)
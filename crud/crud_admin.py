@@ -14,7 +14,7 @@ class CRUDAdmin(CRUDBase[Admin, AdminCreate, AdminUpdate]):
         admin = await self.get(db, id=id)
         if not admin:
             return None
-        if not security.verifyPassword(password, admin.hashed_password):
+        if not await security.verifyPasswordAsync(password, admin.hashed_password):
             return None
         return admin
 
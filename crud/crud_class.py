@@ -1,46 +1,38 @@
-from typing import Optional, List
+from typing import List, Optional, Sequence, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement, RowMapping, select
 
+from core import acl
 from crud.base import CRUDBase
+from db.search import keywordMatch
 from models.class_lesson_relation import ClassLessonRelation
 from models.class_ import Class
 from schemas.class_ import ClassCreate, ClassUpdate
 
 
 class CRUDClass(CRUDBase[Class, ClassCreate, ClassUpdate]):
-    async def getMultiByLessonId(self, db: AsyncSession, lesson_id: int) -> List[Class]:
-        query = select(
-            Class
-        ).join(
-            ClassLessonRelation
-        ).filter(
-            ClassLessonRelation.lesson_id == lesson_id
-        )
-        return (await db.execute(query)).scalars().all()
-
-    async def getMultiByOptionalKeyword(
+    async def getMultiByLessonId(
             self,
             db: AsyncSession,
-            keyword: Optional[str] = None,
-            offset: int = 0,
-            limit: int = 10) -> list[Class]:
-        if keyword == None or keyword == "":
-            baseQuery = select(
-                Class
-            )
-        else:
-            baseQuery = select(
-                Class
-            ).where(
-                Class.name.like(f"%{keyword}%")
-            )
-
-        totalQuery = select(func.count()).select_from(baseQuery)
-        paginateQuery = baseQuery.offset(offset).limit(limit)
-
-        return (await db.execute(paginateQuery)).scalars().all(), (await db.execute(totalQuery)).scalar()
+            lesson_id: int,
+            columns: Optional[List[str]] = None) -> Sequence[RowMapping]:
+        return await self.selectRows(db, columns, [
+            Class.id.in_(select(
+                ClassLessonRelation.class_id
+            ).filter(
+                ClassLessonRelation.lesson_id == lesson_id
+            ))
+        ])
+
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        rank = keywordMatch(keyword, Class.name)
+        return [rank > 0], rank
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Class:
+        obj = await super().remove(db, id=id)
+        await acl.invalidateClassLessons([id])
+        return obj
 
 
 class_ = CRUDClass(Class)
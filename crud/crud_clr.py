@@ -1,26 +1,30 @@
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+from core import acl
 from models.class_lesson_relation import ClassLessonRelation
-from crud.base import CRUDBase
+from crud.base import CRUDBase, insertIgnore
 
 
 class CRUDClassLessonRelation(CRUDBase[ClassLessonRelation, None, None]):
     async def updateLessonClasses(self, db: AsyncSession, lesson_id: int, class_ids: list[int]) -> None:
+        query = select(ClassLessonRelation.class_id).where(
+            ClassLessonRelation.lesson_id == lesson_id
+        )
+        oldClassIds = (await db.execute(query)).scalars().all()
         query = delete(ClassLessonRelation).where(
             ClassLessonRelation.lesson_id == lesson_id,
             ClassLessonRelation.class_id.notin_(class_ids)
         )
         await db.execute(query)
-        query = insert(ClassLessonRelation).prefix_with(
-            'IGNORE'
-        ).values([{
+        query = insertIgnore(ClassLessonRelation).values([{
             "lesson_id": lesson_id,
             "class_id": class_id
         } for class_id in class_ids])
         await db.execute(query)
         await db.commit()
+        await acl.invalidateClassLessons([*oldClassIds, *class_ids])
 
 
 classLessonRelation = CRUDClassLessonRelation(ClassLessonRelation)
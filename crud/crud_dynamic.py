@@ -1,45 +1,83 @@
-from typing import Optional, Tuple, Union
-from sqlalchemy import select
+from typing import Optional, Sequence
+from sqlalchemy import RowMapping, Select, literal, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud.base import CRUDBase
+from models.class_lesson_relation import ClassLessonRelation
 from models.dynamic import Dynamic
 from models.lesson import Lesson
 from schemas.dynamic import DynamicCreate, DynamicUpdate
 
+# 课程广播动态的 scope，整门课只存一行，user_id 留空；读取时映射为读取者自己的 scope / user_id
+LESSON_SCOPE = "lesson"
+
+DYNAMIC_LIST_LIMIT = 50
+
 
 class CRUDDynamic(CRUDBase[Dynamic, DynamicCreate, DynamicUpdate]):
-    async def insertMultiByStudentIds(
+    async def createLessonBroadcast(
         self,
-            db: AsyncSession,
-            student_ids: list[int],
-            lesson_id: int,
-            content: str,
-            created_time: int,
-            scope: str,
-    ) -> None:
-        data = [Dynamic(**{
+        db: AsyncSession,
+        lesson_id: int,
+        content: str,
+        created_time: int,
+    ) -> Dynamic:
+        return await self.create(db, obj_in={
             "lesson_id": lesson_id,
             "content": content,
             "created_time": created_time,
-            "scope": scope,
-            "user_id": student_id,
-        }) for student_id in student_ids]
-        db.add_all(data)
-        await db.commit()
+            "scope": LESSON_SCOPE,
+            "user_id": "",
+        })
 
-    async def getMultiByUserIdAndScope(self, db: AsyncSession, user_id: str, scope: str) -> Optional[Tuple[Dynamic, Lesson]]:
-        query = select(
-            Dynamic, Lesson
-        ).join(
-            Lesson, Lesson.id == Dynamic.lesson_id
+    def _latest(self, scope: str, user_id: str, *where) -> Select:
+        # 每一路都走 (user_id, scope, created_time) 或 (lesson_id, scope, created_time) 索引倒序扫描，取满 N 条即停
+        return select(
+            Dynamic.id,
+            Dynamic.lesson_id,
+            Dynamic.content,
+            Dynamic.created_time,
+            literal(scope).label("scope"),
+            literal(user_id).label("user_id"),
         ).where(
-            Dynamic.scope == scope,
-            Dynamic.user_id == user_id
+            *where
         ).order_by(
             Dynamic.created_time.desc()
-        ).limit(50)
-        return (await db.execute(query)).all()
+        ).limit(DYNAMIC_LIST_LIMIT)
+
+    async def getMultiByUserIdAndScope(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        scope: str,
+        class_id: Optional[int] = None
+    ) -> Sequence[RowMapping]:
+        """
+        用户自己的动态，传入 class_id 时再合并班级所选课程的广播动态，返回带课程标题的行
+        广播动态按调用者的 scope / user_id 返回，对客户端来说与逐人写入的动态没有区别
+        用户自己和每门课程各取前 N 条，用 UNION ALL 合成一条语句，数据库只需在这些行上排序取前 N 条
+        """
+        branches = [self._latest(scope, user_id, Dynamic.scope == scope, Dynamic.user_id == user_id)]
+        if class_id is not None:
+            lessonIds = (await db.execute(select(
+                ClassLessonRelation.lesson_id
+            ).where(
+                ClassLessonRelation.class_id == class_id
+            ))).scalars().all()
+            branches += [
+                self._latest(scope, user_id, Dynamic.lesson_id == lesson_id, Dynamic.scope == LESSON_SCOPE)
+                for lesson_id in lessonIds
+            ]
+        latest = union_all(*[branch.subquery().select() for branch in branches]).subquery()
+        query = select(
+            latest,
+            Lesson.title.label("lesson_title"),
+        ).join(
+            Lesson, Lesson.id == latest.c.lesson_id
+        ).order_by(
+            latest.c.created_time.desc()
+        ).limit(DYNAMIC_LIST_LIMIT)
+        return (await db.execute(query)).mappings().all()
 
 
 dynamic = CRUDDynamic(Dynamic)
@@ -1,80 +1,148 @@
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement, RowMapping, and_, select
 
-from crud.base import CRUDBase
+from core import acl
+from crud.base import CRUDBase, memoize
+from db.search import keywordMatch
 from models.class_lesson_relation import ClassLessonRelation
 from models.lesson import Lesson
 from models.student import Student
+from models.teacher import Teacher
 from schemas.lesson import LessonCreate, LessonUpdate
 
 
 class CRUDLesson(CRUDBase[Lesson, LessonCreate, LessonUpdate]):
-    async def getMultiByClassId(self, db: AsyncSession, class_id: int) -> Optional[List[Lesson]]:
+    async def getMultiByClassId(
+            self,
+            db: AsyncSession,
+            class_id: int,
+            columns: Optional[List[str]] = None) -> Sequence[RowMapping]:
+        return await self.selectRows(db, columns, [
+            Lesson.id.in_(select(
+                ClassLessonRelation.lesson_id
+            ).filter(
+                ClassLessonRelation.class_id == class_id
+            ))
+        ])
+
+    async def getMultiByTeacherId(
+            self,
+            db: AsyncSession,
+            teacher_id: str,
+            columns: Optional[List[str]] = None) -> Sequence[RowMapping]:
+        return await self.selectRows(db, columns, [Lesson.teacher_id == teacher_id])
+
+    async def getWithTeacherAndRelation(
+            self,
+            db: AsyncSession,
+            lesson_id: int,
+            class_id: Optional[int] = None) -> Optional[Tuple[Lesson, Teacher, Optional[int]]]:
         query = select(
-            Lesson
+            Lesson, Teacher, ClassLessonRelation.id
         ).join(
-            ClassLessonRelation
+            Teacher, Teacher.id == Lesson.teacher_id
+        ).outerjoin(
+            ClassLessonRelation, and_(
+                ClassLessonRelation.lesson_id == Lesson.id,
+                ClassLessonRelation.class_id == class_id
+            )
+        ).where(
+            Lesson.id == lesson_id
+        )
+        return (await db.execute(query)).first()
+
+    async def getIdsByClassId(self, db: AsyncSession, class_id: int) -> List[int]:
+        query = select(
+            ClassLessonRelation.lesson_id
         ).filter(
             ClassLessonRelation.class_id == class_id
         )
         return (await db.execute(query)).scalars().all()
 
-    async def getMultiByTeacherId(self, db: AsyncSession, teacher_id: int) -> Optional[List[Lesson]]:
+    async def getIdsByTeacherId(self, db: AsyncSession, teacher_id: str) -> List[int]:
         query = select(
-            Lesson
+            Lesson.id
         ).filter(
             Lesson.teacher_id == teacher_id
         )
         return (await db.execute(query)).scalars().all()
 
-    async def isClassHasLesson(self, db: AsyncSession, class_id: int, lesson_id: int) -> bool:
-        query = select(
-            ClassLessonRelation
-        ).filter(
-            ClassLessonRelation.class_id == class_id,
-            ClassLessonRelation.lesson_id == lesson_id
+    async def isClassHasLesson(self, db: AsyncSession, class_id: int, lesson_id: int, memo: bool = True) -> bool:
+        return await memoize(
+            db, (ClassLessonRelation, "isClassHasLesson", class_id, lesson_id),
+            lambda: acl.hasLesson(
+                "class", class_id, lesson_id,
+                lambda: self.getIdsByClassId(db, class_id)
+            ),
+            memo
         )
-        return (await db.execute(query)).scalars().first() is not None
 
-    async def isTeacherHasLesson(self, db: AsyncSession, teacher_id: int, lesson_id: int) -> bool:
-        query = select(
-            Lesson
-        ).filter(
-            Lesson.teacher_id == teacher_id,
-            Lesson.id == lesson_id
+    async def isTeacherHasLesson(self, db: AsyncSession, teacher_id: str, lesson_id: int, memo: bool = True) -> bool:
+        return await memoize(
+            db, (Lesson, "isTeacherHasLesson", teacher_id, lesson_id),
+            lambda: acl.hasLesson(
+                "teacher", teacher_id, lesson_id,
+                lambda: self.getIdsByTeacherId(db, teacher_id)
+            ),
+            memo
         )
-        return (await db.execute(query)).scalars().first() is not None
 
-    async def getMultiByOptionalKeyword(
-            self,
-            db: AsyncSession,
-            keyword: Optional[str] = None,
-            offset: int = 0,
-            limit: int = 10) -> Optional[Tuple[List[Lesson], int]]:
-        if keyword == None or keyword == "":
-            baseQuery = select(
-                Lesson
-            )
-        elif keyword.isdigit():
-            baseQuery = select(
-                Lesson
-            ).where(
-                Lesson.year == int(keyword)
-            )
-        else:
-            baseQuery = select(
-                Lesson
-            ).where(
-                Lesson.title.like(f"%{keyword}%") |
-                Lesson.teacher_id.like(f"%{keyword}%")
-            )
+    async def create(self, db: AsyncSession, *, obj_in: Union[LessonCreate, Dict[str, Any]]) -> Lesson:
+        db_obj = await super().create(db, obj_in=obj_in)
+        await acl.invalidateTeacherLessons([db_obj.teacher_id])
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Lesson,
+        obj_in: Union[LessonUpdate, Dict[str, Any]]
+    ) -> Lesson:
+        oldTeacherId = db_obj.teacher_id
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        await acl.invalidateTeacherLessons([oldTeacherId, db_obj.teacher_id])
+        return db_obj
+
+    async def patch(
+        self,
+        db: AsyncSession,
+        id: int,
+        values: Union[LessonUpdate, Dict[str, Any]]
+    ) -> int:
+        if not isinstance(values, dict):
+            values = values.dict(exclude_unset=True)
+        if "teacher_id" not in values:
+            return await super().patch(db, id, values)
+
+        query = select(Lesson.teacher_id).filter(Lesson.id == id)
+        oldTeacherId = (await db.execute(query)).scalar()
+        rowcount = await super().patch(db, id, values)
+        await acl.invalidateTeacherLessons([oldTeacherId, values["teacher_id"]])
+        return rowcount
 
-        totalQuery = select(func.count()).select_from(baseQuery)
-        paginateQuery = baseQuery.offset(offset).limit(limit)
+    async def remove(self, db: AsyncSession, *, id: int) -> Lesson:
+        query = select(
+            ClassLessonRelation.class_id
+        ).filter(
+            ClassLessonRelation.lesson_id == id
+        )
+        classIds = (await db.execute(query)).scalars().all()
+        obj = await super().remove(db, id=id)
+        await acl.invalidateTeacherLessons([obj.teacher_id])
+        await acl.invalidateClassLessons(classIds)
+        return obj
 
-        return (await db.execute(paginateQuery)).scalars().all(), (await db.execute(totalQuery)).scalar()
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        # 四位数字按学年、其余数字按教师工号前缀匹配，分别走各自的索引；其余走标题的全文索引
+        if keyword.isdigit() and len(keyword) == 4:
+            return [Lesson.year == int(keyword)], None
+        if keyword.isdigit():
+            return [Lesson.teacher_id.like(f"{keyword}%")], None
+        rank = keywordMatch(keyword, Lesson.title)
+        return [rank > 0], rank
 
 
 lesson = CRUDLesson(Lesson)
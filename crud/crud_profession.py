@@ -1,7 +1,6 @@
-from typing import Optional, Tuple, List
+from typing import List, Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement
 
 from crud.base import CRUDBase
 from models.profession import Profession
@@ -9,27 +8,9 @@ from schemas.profession import ProfessionCreate, ProfessionUpdate
 
 
 class CRUDProfession(CRUDBase[Profession, ProfessionCreate, ProfessionUpdate]):
-    async def getPaginatedMultiByOptionalKeyword(
-            self,
-            db: AsyncSession,
-            keyword: Optional[str] = None,
-            offset: int = 0,
-            limit: int = 10) -> Tuple[List[Profession], int]:
-        if keyword == None or keyword == "":
-            baseQuery = select(
-                Profession
-            )
-        else:
-            baseQuery = select(
-                Profession
-            ).where(
-                Profession.name.like(f"%{keyword}%")
-            )
-
-        totalQuery = select(func.count()).select_from(baseQuery)
-        paginateQuery = baseQuery.offset(offset).limit(limit)
-
-        return (await db.execute(paginateQuery)).scalars().all(), (await db.execute(totalQuery)).scalar()
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        # 专业表很小，直接扫描即可
+        return [Profession.name.like(f"%{keyword}%")], None
 
 
 profession = CRUDProfession(Profession)
@@ -1,10 +1,11 @@
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 
 from models.student_task_status import StudentTaskStatus
-from crud.base import CRUDBase
+from crud.base import CRUDBase, memoize
+from models.class_lesson_relation import ClassLessonRelation
 from models.student import Student
 from schemas.student_task_status import StudentTaskStatusCreate, StudentTaskStatusUpdate
 
@@ -19,25 +20,34 @@ class CRUDStudentTaskStatus(CRUDBase[StudentTaskStatus, StudentTaskStatusCreate,
         )
         return (await db.execute(query)).scalars().first()
 
-    async def insertMultiByStudentIdsAndTaskId(self, db: AsyncSession, student_ids: list[int], task_id: int) -> None:
-        data = [StudentTaskStatus(**{
-            "student_id": student_id,
-            "task_id": task_id,
-            "status": "uncompleted",
-            "text": "",
-            "files": "[]",
-            "score": -1,
-        }) for student_id in student_ids]
-        db.add_all(data)
+    async def insertMultiByLessonIdAndTaskId(self, db: AsyncSession, lesson_id: int, task_id: int) -> int:
+        """
+        为选了该课程的所有学生生成任务状态，INSERT ... SELECT 在数据库端完成，学生数据不经过应用，返回插入的行数
+        """
+        students = select(
+            Student.id,
+            literal(task_id),
+            literal("uncompleted"),
+            literal(""),
+            literal("[]"),
+            literal(-1),
+        ).join(
+            ClassLessonRelation, ClassLessonRelation.class_id == Student.class_id
+        ).where(
+            ClassLessonRelation.lesson_id == lesson_id
+        )
+        query = insert(StudentTaskStatus).from_select(
+            ["student_id", "task_id", "status", "text", "files", "score"], students
+        )
+        rowcount = (await db.execute(query)).rowcount
         await db.commit()
+        return rowcount
 
     async def updateMultiToExpiredByTaskId(self, db: AsyncSession, task_id: int) -> None:
-        query = update(StudentTaskStatus).where(
+        await self.updateMany(db, [
             StudentTaskStatus.task_id == task_id,
             StudentTaskStatus.status != "checked"
-        ).values(status="expired")
-        await db.execute(query)
-        await db.commit()
+        ], {"status": "expired"})
 
     async def updateMultiExpiredToOtherByTaskId(self, db: AsyncSession, task_id: int) -> None:
         query = update(StudentTaskStatus).where(
@@ -76,14 +86,17 @@ class CRUDStudentTaskStatus(CRUDBase[StudentTaskStatus, StudentTaskStatusCreate,
         )
         await db.execute(query)
 
-    async def isStudentHasTaskStatus(self, db: AsyncSession, student_id: int, task_id: int) -> bool:
-        query = select(
-            StudentTaskStatus
-        ).where(
-            StudentTaskStatus.student_id == student_id,
-            StudentTaskStatus.task_id == task_id
-        )
-        return (await db.execute(query)).scalars().first() is not None
+    async def isStudentHasTaskStatus(self, db: AsyncSession, student_id: int, task_id: int, memo: bool = True) -> bool:
+        async def loader():
+            # 只取主键，由 (student_id, task_id) 唯一索引覆盖
+            query = select(
+                StudentTaskStatus.id
+            ).where(
+                StudentTaskStatus.student_id == student_id,
+                StudentTaskStatus.task_id == task_id
+            )
+            return (await db.execute(query)).scalars().first() is not None
+        return await memoize(db, (StudentTaskStatus, "isStudentHasTaskStatus", student_id, task_id), loader, memo)
 
 
 studentTaskStatus = CRUDStudentTaskStatus(StudentTaskStatus)
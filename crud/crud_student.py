@@ -2,12 +2,14 @@ from core import security
 from models.class_lesson_relation import ClassLessonRelation
 from models.class_ import Class
 from schemas.student import StudentCreate, StudentUpdate
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement, RowMapping, select
 
 from crud.base import CRUDBase
+from db.functions import rand
+from db.search import keywordMatch
 from models.student import Student
 
 
@@ -16,7 +18,7 @@ class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
         student = await self.get(db, id=id)
         if not student:
             return None
-        if not security.verifyPassword(password, student.hashed_password):
+        if not await security.verifyPasswordAsync(password, student.hashed_password):
             return None
         return student
 
@@ -30,11 +32,24 @@ class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
         ).where(
             ClassLessonRelation.lesson_id == lesson_id
         ).order_by(
-            func.rand()
+            rand()
         ).limit(count)
 
         return (await db.execute(query)).scalars().all()
 
+    async def getMultiByLessonId(
+            self,
+            db: AsyncSession,
+            lesson_id: int,
+            columns: Optional[List[str]] = None) -> Sequence[RowMapping]:
+        return await self.selectRows(db, columns, [
+            Student.class_id.in_(select(
+                ClassLessonRelation.class_id
+            ).filter(
+                ClassLessonRelation.lesson_id == lesson_id
+            ))
+        ])
+
     async def getMultiByClassId(self, db: AsyncSession, class_id: int) -> Optional[List[Student]]:
         query = select(
             Student
@@ -43,28 +58,12 @@ class CRUDStudent(CRUDBase[Student, StudentCreate, StudentUpdate]):
         )
         return (await db.execute(query)).scalars().all()
 
-    async def getMultiByOptionalKeyword(
-            self,
-            db: AsyncSession,
-            keyword: Optional[str] = None,
-            offset: int = 0,
-            limit: int = 10) -> Optional[Tuple[List[Student], int]]:
-        if keyword == None or keyword == "":
-            baseQuery = select(
-                Student
-            ).offset(offset).limit(limit)
-        else:
-            baseQuery = select(
-                Student
-            ).where(
-                Student.name.like(f"%{keyword}%") |
-                Student.id.like(f"%{keyword}%")
-            ).offset(offset).limit(limit)
-
-        totalQuery = select(func.count()).select_from(baseQuery)
-        paginateQuery = baseQuery.offset(offset).limit(limit)
-
-        return (await db.execute(paginateQuery)).scalars().all(), (await db.execute(totalQuery)).scalar()
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        # 学号走主键前缀匹配，姓名走全文索引
+        if keyword.isdigit():
+            return [Student.id.like(f"{keyword}%")], None
+        rank = keywordMatch(keyword, Student.name)
+        return [rank > 0], rank
 
 
 student = CRUDStudent(Student)
@@ -4,7 +4,7 @@ from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from crud.base import CRUDBase
+from crud.base import CRUDBase, memoize
 from models.lesson import Lesson
 from models.task import Task
 from models.student_task_status import StudentTaskStatus
@@ -42,16 +42,18 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
         )
         return (await db.execute(query)).scalars().all()
 
-    async def isTeacherHasTask(self, db: AsyncSession, teacher_id: str, task_id: int) -> bool:
-        query = select(
-            Task
-        ).join(
-            Lesson
-        ).where(
-            Task.id == task_id,
-            Lesson.teacher_id == teacher_id
-        )
-        return (await db.execute(query)).scalars().first() is not None
+    async def isTeacherHasTask(self, db: AsyncSession, teacher_id: str, task_id: int, memo: bool = True) -> bool:
+        async def loader():
+            query = select(
+                Task.id
+            ).join(
+                Lesson
+            ).where(
+                Task.id == task_id,
+                Lesson.teacher_id == teacher_id
+            )
+            return (await db.execute(query)).scalars().first() is not None
+        return await memoize(db, (Task, "isTeacherHasTask", teacher_id, task_id), loader, memo)
 
     async def getMultiWithUncheckExpiredStatusByTeacherId(self, db: AsyncSession, teacher_id: str) -> List[Task]:
         query = select(
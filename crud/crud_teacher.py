@@ -1,9 +1,10 @@
 from typing import List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement
 
 from crud.base import CRUDBase
+from db.search import keywordMatch
 from models.teacher import Teacher
 from schemas.teacher import TeacherCreate, TeacherUpdate
 from core import security
@@ -14,32 +15,16 @@ class CRUDTeacher(CRUDBase[Teacher, TeacherCreate, TeacherUpdate]):
         teacher = await self.get(db, id=id)
         if not teacher:
             return None
-        if not security.verifyPassword(password, teacher.hashed_password):
+        if not await security.verifyPasswordAsync(password, teacher.hashed_password):
             return None
         return teacher
 
-    async def getMultiByOptionalKeyword(
-            self,
-            db: AsyncSession,
-            keyword: Optional[str] = None,
-            offset: int = 0,
-            limit: int = 10) -> Optional[Tuple[List[Teacher], int]]:
-        if keyword == None or keyword == "":
-            baseQuery = select(
-                Teacher
-            )
-        else:
-            baseQuery = select(
-                Teacher
-            ).where(
-                Teacher.name.like(f"%{keyword}%") |
-                Teacher.id.like(f"%{keyword}%")
-            )
-
-        totalQuery = select(func.count()).select_from(baseQuery)
-        paginateQuery = baseQuery.offset(offset).limit(limit)
-
-        return (await db.execute(paginateQuery)).scalars().all(), (await db.execute(totalQuery)).scalar()
+    def keywordSearch(self, keyword: str) -> Tuple[List[ColumnElement[bool]], Optional[ColumnElement[float]]]:
+        # 工号走主键前缀匹配，姓名走全文索引
+        if keyword.isdigit():
+            return [Teacher.id.like(f"{keyword}%")], None
+        rank = keywordMatch(keyword, Teacher.name)
+        return [rank > 0], rank
 
 
 teacher = CRUDTeacher(Teacher)
@@ -1,16 +1,164 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import itertools
+import time
+from typing import Optional
+
+from sqlalchemy import event, make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from core.config import settings
+from core.totals import invalidateTotals
+from db.redis import SessionRedis
+from db.sqlstats import instrumentEngine
 
-engine = create_async_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录每次从连接池检出连接的等待时间，用于按实际流量调整连接池大小
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkoutStats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkoutStats["timeouts"] += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.checkoutStats["checkouts"] += 1
+            self.checkoutStats["wait_total"] += wait
+            self.checkoutStats["wait_max"] = max(self.checkoutStats["wait_max"], wait)
+
+
+class PrimarySession(AsyncSession):
+    """
+    主库 session，提交写入后标记当前用户在短时间内只读主库
+    """
+
+    async def commit(self):
+        await super().commit()
+        await invalidateTotals(self.info.pop("wrote_tables", ()))
+        stickyKey = self.info.get("sticky_key")
+        if self.info.pop("wrote", False) and stickyKey:
+            async with SessionRedis() as redis:
+                await redis.set(stickyKey, 1, ex=settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def _markWrittenTables(session, tables) -> None:
+    session.info["wrote"] = True
+    session.info.setdefault("wrote_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _markWriteOnFlush(session, flush_context) -> None:
+    _markWrittenTables(session, (
+        obj.__table__.name
+        for obj in itertools.chain(session.new, session.dirty, session.deleted)
+    ))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _markWriteOnExecute(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        table = getattr(orm_execute_state.statement, "table", None)
+        _markWrittenTables(
+            orm_execute_state.session,
+            [table.name] if table is not None else []
+        )
+
+
+def _createEngine(uri: str) -> AsyncEngine:
+    if make_url(uri).get_backend_name() == "sqlite":
+        # SQLite 用于本地压测，连接池交给 SQLAlchemy 按文件库 / 内存库选择默认实现
+        theEngine = create_async_engine(uri)
+        instrumentEngine(theEngine)
+        return theEngine
+
+    theEngine = create_async_engine(
+        uri,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    instrumentEngine(theEngine)
+    return theEngine
+
+
+engine = _createEngine(settings.SQLALCHEMY_DATABASE_URI)
 
 SessionDatabase = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
-    class_=AsyncSession,
+    class_=PrimarySession,
     expire_on_commit=False
 )
+
+replicaEngines = [_createEngine(uri) for uri in settings.SQLALCHEMY_REPLICA_URIS]
+
+replicaSessions = [sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=replicaEngine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) for replicaEngine in replicaEngines]
+
+_replicaCycle = itertools.cycle(range(len(replicaSessions)))
+_replicaDownUntil = [0.0] * len(replicaSessions)
+
+
+async def openReplicaSession() -> Optional[AsyncSession]:
+    """
+    轮询选取一个可用副本并立即检出连接，所有副本都不可用时返回 None
+    """
+    for _ in range(len(replicaSessions)):
+        index = next(_replicaCycle)
+        if _replicaDownUntil[index] > time.monotonic():
+            continue
+        db = replicaSessions[index]()
+        try:
+            await db.connection()
+            return db
+        except (SQLAlchemyError, OSError):
+            await db.close()
+            _replicaDownUntil[index] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+    return None
+
+
+def getPoolStats(theEngine: AsyncEngine = engine) -> dict:
+    pool = theEngine.sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    checkoutStats = getattr(pool, "checkoutStats", None)
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+    if checkoutStats:
+        checkouts = checkoutStats["checkouts"]
+        stats.update({
+            "checkouts": checkouts,
+            "checkout_timeouts": checkoutStats["timeouts"],
+            "checkout_wait_avg": checkoutStats["wait_total"] / checkouts if checkouts else 0.0,
+            "checkout_wait_max": checkoutStats["wait_max"],
+        })
+    return stats
@@ -0,0 +1,17 @@
+from sqlalchemy import Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+
+class rand(GenericFunction):
+    """
+    随机数，用于 ORDER BY 随机取样；MySQL 为 RAND()，SQLite / PostgreSQL 为 RANDOM()
+    """
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(rand, "sqlite")
+@compiles(rand, "postgresql")
+def _compileRandom(element, compiler, **kw):
+    return "random()"
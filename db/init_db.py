@@ -14,7 +14,10 @@ from models.student import Student
 from models.task import Task
 from models.teacher import Teacher
 
+import asyncio
+
 import ujson
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from botocore.client import ClientError
 
@@ -26,9 +29,22 @@ from core.config import settings
 from core import security
 
 
+def createMissingIndexes(conn) -> None:
+    """
+    create_all 不会给已存在的表补建索引，升级时按名称补齐模型中新增的索引（包括 FULLTEXT 索引）
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+
 async def initDatabase(db: AsyncSession) -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(createMissingIndexes)
 
     if not await admin.get(db, id=settings.FIRST_ADMIN_ID):
         obj = schemas.AdminCreate(
@@ -41,7 +57,7 @@ async def initDatabase(db: AsyncSession) -> None:
         )
         await admin.create(db, obj_in={
             **obj.dict(),
-            "hashed_password": security.getPasswordHash(settings.FIRST_ADMIN_PASSWORD),
+            "hashed_password": await security.getPasswordHashAsync(settings.FIRST_ADMIN_PASSWORD),
         })
 
 
@@ -77,12 +93,58 @@ async def initOSS(oss: any):
         await oss.create_bucket(Bucket="cloud")
 
 
-async def initDB():
-    async with SessionDatabase() as db:
-        await initDatabase(db)
+async def provision():
+    """
+    建表并补建缺失的索引、初始管理员与存储桶，各项均可重复执行；多个实例同时执行时由 Redis 锁串行化
+    """
+    async def provisionDatabase():
+        async with SessionDatabase() as db:
+            await initDatabase(db)
+
+    async def provisionOSS():
+        async with SessionOSS() as oss:
+            await initOSS(oss)
+
+    async with SessionRedis() as r:
+        async with r.lock(
+            "lock:provision",
+            timeout=settings.PROVISION_LOCK_TIMEOUT,
+            blocking_timeout=settings.PROVISION_LOCK_TIMEOUT
+        ):
+            await asyncio.gather(provisionDatabase(), provisionOSS())
+
+
+async def checkDatabase():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        if not await conn.run_sync(lambda conn: inspect(conn).has_table(Admin.__tablename__)):
+            raise RuntimeError(
+                "Database has not been provisioned, run `python -m db.init_db` "
+                "or set PROVISION_ON_STARTUP=true")
 
+
+async def checkOSS():
     async with SessionOSS() as oss:
-        await initOSS(oss)
+        await asyncio.gather(
+            oss.head_bucket(Bucket="public"),
+            oss.head_bucket(Bucket="cloud"),
+        )
+
 
+async def checkRedis():
     async with SessionRedis() as r:
         await r.ping()
+
+
+async def initDB():
+    if settings.PROVISION_ON_STARTUP:
+        await provision()
+    await asyncio.gather(checkDatabase(), checkOSS(), checkRedis())
+
+
+if __name__ == "__main__":
+    async def main():
+        await provision()
+        await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+from typing import Any
+
+from sqlalchemy import Float, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement, case
+
+# 与 MySQL 服务端的 ngram_token_size 保持一致（默认值为 2）
+NGRAM_TOKEN_SIZE = 2
+
+
+class KeywordMatch(FunctionElement):
+    """
+    关键字相关度，数值越大越相关，不匹配时为 0
+    MySQL 上编译为走 FULLTEXT(ngram) 索引的 MATCH ... AGAINST，其他数据库以及短于 ngram 长度的关键字退化为 LIKE 命中计数
+    """
+    type = Float()
+    name = "keyword_match"
+    # 编译时会根据关键字值改写参数，不能复用语句缓存
+    inherit_cache = False
+
+
+def keywordMatch(keyword: str, *columns: Any) -> KeywordMatch:
+    return KeywordMatch(literal(keyword), *columns)
+
+
+def _toBooleanQuery(keyword: str) -> str:
+    # 按短语匹配以保持“包含”的语义
+    return '"%s"' % keyword.replace('"', " ").strip()
+
+
+@compiles(KeywordMatch, "mysql")
+def _compileMySQL(element, compiler, **kw):
+    keyword, *columns = element.clauses
+    # 短于 ngram 长度的词不会单独成为索引中的词元，前缀匹配又会漏掉位于词元末尾的字（如用“明”搜“李明”），
+    # 这种情况退化为 LIKE
+    if len(keyword.value.replace('"', " ").strip()) < NGRAM_TOKEN_SIZE:
+        return _compileDefault(element, compiler, **kw)
+    return "MATCH (%s) AGAINST (%s IN BOOLEAN MODE)" % (
+        ", ".join(compiler.process(column, **kw) for column in columns),
+        compiler.process(literal(_toBooleanQuery(keyword.value)), **kw),
+    )
+
+
+@compiles(KeywordMatch)
+def _compileDefault(element, compiler, **kw):
+    keyword, *columns = element.clauses
+    pattern = f"%{keyword.value}%"
+    return compiler.process(sum(
+        (case((column.like(pattern), 1), else_=0) for column in columns[1:]),
+        case((columns[0].like(pattern), 1), else_=0)
+    ), **kw)
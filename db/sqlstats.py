@@ -0,0 +1,106 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def getSuspectedNPlusOne(self) -> List[str]:
+        return [
+            statement for statement, count in self.statements.items()
+            if count >= settings.DB_N_PLUS_ONE_THRESHOLD
+        ]
+
+
+currentQueryStats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "currentQueryStats", default=None
+)
+
+
+# 开始时间记在本次执行的 context 上，语句执行失败时不会触发 after_cursor_execute，也不会在连接上留下残留
+def _beforeCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def _afterCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    stats = currentQueryStats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - context._query_start)
+
+
+def instrumentEngine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _beforeCursorExecute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _afterCursorExecute)
+
+
+class QueryStatsMiddleware:
+    """
+    统计每个请求执行的 SQL 条数与耗时，写入日志与响应头，并标记疑似 N+1 的重复语句
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = currentQueryStats.set(stats)
+
+        async def sendWithStats(message):
+            if message["type"] == "http.response.start" and settings.DB_QUERY_STATS_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-query-time", f"{stats.duration * 1000:.2f}".encode()))
+                suspected = stats.getSuspectedNPlusOne()
+                if suspected:
+                    headers.append((b"x-db-suspected-n-plus-one", str(len(suspected)).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sendWithStats)
+        finally:
+            currentQueryStats.reset(token)
+            logger.debug(
+                "%s %s: %d queries in %.2f ms",
+                scope["method"], scope["path"], stats.count, stats.duration * 1000
+            )
+            for statement in stats.getSuspectedNPlusOne():
+                logger.warning(
+                    "Suspected N+1 in %s %s, executed %d times: %s",
+                    scope["method"], scope["path"], stats.statements[statement], statement
+                )
+
+
+def assertQueryBudget(response, maxQueries: int) -> None:
+    """
+    测试中使用（需开启 DB_QUERY_STATS_HEADERS），根据响应头断言接口执行的 SQL 条数不超过预算
+    """
+    count = int(response.headers["x-db-query-count"])
+    if count > maxQueries:
+        raise AssertionError(
+            f"{response.request.method} {response.request.url.path} executed {count} queries, "
+            f"budget is {maxQueries}"
+        )
@@ -6,6 +6,7 @@ from api import router
 from fastapi import FastAPI
 from core.config import settings
 from db.init_db import initDB
+from db.sqlstats import QueryStatsMiddleware
 
 
 app = FastAPI(
@@ -25,6 +26,8 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+app.add_middleware(QueryStatsMiddleware)
+
 app.include_router(router, prefix=settings.API_V1_STR)
 
 
@@ -1,10 +1,25 @@
+from operator import attrgetter
+
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 
+@event.listens_for(Base, "after_mapper_constructed", propagate=True)
+def compileConverters(mapper, cls):
+    """
+    每个模型类在映射时生成一次列名元组和取值函数，供 to_dict 和 CRUD 写入使用，避免每次遍历 __table__.columns
+    """
+    names = tuple(c.name for c in cls.__table__.columns)
+    getter = attrgetter(*names)
+    cls.__column_names__ = names
+    cls.__column_set__ = frozenset(names)
+    cls.__column_values__ = staticmethod(getter if len(names) > 1 else lambda obj: (getter(obj),))
+
+
 def to_dict(self):
-    return {c.name: getattr(self, c.name, None) for c in self.__table__.columns}
+    return dict(zip(self.__column_names__, self.__column_values__(self)))
 
 
 Base.to_dict = to_dict
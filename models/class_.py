@@ -1,13 +1,16 @@
-from sqlalchemy import Column, ForeignKey, String
-from sqlalchemy.dialects.mysql import SMALLINT, INTEGER
+from sqlalchemy import Column, ForeignKey, Index, String
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import SMALLINT, INTEGER
 from models.profession import Profession
 
 
 class Class(Base):
     __tablename__ = 'class'
+    __table_args__ = (
+        Index("ft_class_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(INTEGER(11), primary_key=True)
     grade = Column(SMALLINT(6), nullable=False)
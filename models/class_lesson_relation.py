@@ -1,8 +1,8 @@
 from sqlalchemy import Column, ForeignKey, Index
-from sqlalchemy.dialects.mysql import INTEGER
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import INTEGER
 from models.lesson import Lesson
 from models.class_ import Class
 
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, String, Text
-from sqlalchemy.dialects.mysql import INTEGER
+from sqlalchemy import Column, Index, String, Text
 from models.base_class import Base
+from models.types import INTEGER
 
 
 class CloudShare(Base):
     __tablename__ = 'cloud_share'
+    __table_args__ = (
+        Index("cloud_share_key", "key"),
+        Index("cloud_share_path", "path", mysql_length=255),
+    )
 
     id = Column(INTEGER(11), primary_key=True)
     key = Column(String(6), nullable=False)
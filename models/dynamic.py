@@ -1,16 +1,22 @@
-from sqlalchemy import Column, Text, String, ForeignKey
-from sqlalchemy.dialects.mysql import BIGINT, INTEGER
+from sqlalchemy import Column, Text, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import BIGINT, INTEGER
 
 
 class Dynamic(Base):
     __tablename__ = 'dynamic'
+    __table_args__ = (
+        # 动态列表按 (user_id, scope) 过滤并按时间倒序取前 N 条，索引顺序即可避免 filesort
+        Index("user_id_scope_created_time", "user_id", "scope", "created_time"),
+        # 课程广播动态只存一行，读取时按班级所选课程的 (lesson_id, scope) 过滤后按时间取前 N 条
+        Index("lesson_id_scope_created_time", "lesson_id", "scope", "created_time"),
+    )
 
     id = Column(INTEGER(11), primary_key=True)
     lesson_id = Column(ForeignKey('lesson.id', ondelete='CASCADE',
-                       onupdate='CASCADE'), nullable=False, index=True)
+                       onupdate='CASCADE'), nullable=False)
     content = Column(Text, nullable=False)
     created_time = Column(BIGINT(20), nullable=False)
     scope = Column(String(10), nullable=False)
@@ -1,20 +1,23 @@
-from sqlalchemy import SMALLINT, Column, ForeignKey, String, Text
-from sqlalchemy.dialects.mysql import SMALLINT, TINYINT, INTEGER
+from sqlalchemy import Column, ForeignKey, Index, String, Text
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import SMALLINT, TINYINT, INTEGER
 from models.teacher import Teacher
 
 
 class Lesson(Base):
     __tablename__ = 'lesson'
+    __table_args__ = (
+        Index("ft_lesson_title", "title", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(INTEGER(11), primary_key=True)
     thumbnail = Column(Text, nullable=False)
     title = Column(String(32), nullable=False)
     teacher_id = Column(ForeignKey(
         'teacher.id', onupdate='CASCADE'), nullable=False, index=True)
-    year = Column(SMALLINT(6), nullable=False)
+    year = Column(SMALLINT(6), nullable=False, index=True)
     term = Column(TINYINT(4), nullable=False)
     is_over = Column(TINYINT(4), nullable=False)
     notice = Column(Text, nullable=False)
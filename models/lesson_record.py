@@ -1,10 +1,10 @@
 
 
 from sqlalchemy import Column, ForeignKey, Text
-from sqlalchemy.dialects.mysql import INTEGER
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import INTEGER
 
 
 class LessonRecord(Base):
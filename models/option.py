@@ -1,8 +1,8 @@
 from sqlalchemy import Column
 from sqlalchemy import Column, String, Text
-from sqlalchemy.dialects.mysql import INTEGER
 
 from models.base_class import Base
+from models.types import INTEGER
 
 
 class Option(Base):
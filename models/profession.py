@@ -1,7 +1,7 @@
 from sqlalchemy import Column, String
-from sqlalchemy.dialects.mysql import INTEGER
 
 from models.base_class import Base
+from models.types import INTEGER
 
 
 class Profession(Base):
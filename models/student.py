@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, String, Text
+from sqlalchemy import Column, ForeignKey, Index, String, Text
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
@@ -7,6 +7,9 @@ from models.class_ import Class
 
 class Student(Base):
     __tablename__ = 'student'
+    __table_args__ = (
+        Index("ft_student_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(String(10), primary_key=True)
     name = Column(String(16), nullable=False)
@@ -1,8 +1,8 @@
 from sqlalchemy import Column, ForeignKey, String, Text
-from sqlalchemy.dialects.mysql import BIGINT, INTEGER
 from sqlalchemy.orm import relationship
 
 from models.base_class import Base
+from models.types import BIGINT, INTEGER
 from models.lesson import Lesson
 
 
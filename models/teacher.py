@@ -1,9 +1,12 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, Index, String, Text
 from models.base_class import Base
 
 
 class Teacher(Base):
     __tablename__ = 'teacher'
+    __table_args__ = (
+        Index("ft_teacher_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(String(10), primary_key=True)
     name = Column(String(16), nullable=False)
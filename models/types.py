@@ -0,0 +1,22 @@
+"""
+可移植的列类型：在 MySQL 上生成与原先完全相同的 DDL，在其他数据库（如 SQLite）上退化为通用类型
+"""
+from sqlalchemy import BigInteger, Integer, SmallInteger
+from sqlalchemy.dialects import mysql
+
+
+def INTEGER(display_width=None):
+    # SQLite 只有声明为 INTEGER 的主键才是自增的 rowid 别名
+    return Integer().with_variant(mysql.INTEGER(display_width), "mysql")
+
+
+def BIGINT(display_width=None):
+    return BigInteger().with_variant(mysql.BIGINT(display_width), "mysql")
+
+
+def SMALLINT(display_width=None):
+    return SmallInteger().with_variant(mysql.SMALLINT(display_width), "mysql")
+
+
+def TINYINT(display_width=None):
+    return SmallInteger().with_variant(mysql.TINYINT(display_width), "mysql")
@@ -0,0 +1,5 @@
+#! /usr/bin/env bash
+
+# tiangolo/uvicorn-gunicorn 镜像会在启动 gunicorn 之前执行此脚本
+# 建表、初始管理员与存储桶只在这里做一次，Dockerfile 中关闭了 PROVISION_ON_STARTUP，各个 worker 启动时只检查连通性
+python -m db.init_db
@@ -0,0 +1,26 @@
+import os
+import sys
+
+# 单元测试不连接外部服务，只需让配置能完成校验
+for key, value in {
+    "PROJECT_NAME": "test",
+    "BACKEND_CORS_ORIGINS": "[]",
+    "MYSQL_SERVER": "localhost",
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "MYSQL_DB": "test",
+    "REDIS_SERVER": "localhost",
+    "REDIS_USER": "test",
+    "REDIS_PASSWORD": "test",
+    "REDIS_DB": "0",
+    "S3_PUBLIC_ENDPOINT": "http://localhost",
+    "S3_API_ENDPOINT": "http://localhost",
+    "S3_API_ACCESS_KEY": "test",
+    "S3_API_SECRET_KEY": "test",
+    "FIRST_ADMIN_ID": "admin",
+    "FIRST_ADMIN_PASSWORD": "admin",
+    "SQLALCHEMY_DATABASE_URI": "sqlite+aiosqlite://",
+}.items():
+    os.environ.setdefault(key, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,24 @@
+import base64
+
+import pytest
+import ujson
+
+from crud.base import decodeCursor, encodeCursor
+
+
+def _raw(payload) -> str:
+    return base64.urlsafe_b64encode(ujson.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("rank", [0.1 + 0.2, 1 / 3, 12.000000000000002, 5e-324, 0, None])
+def test_rank_round_trips_exactly(rank):
+    # 游标定位对相关度做等值比较，解码结果必须与数据库返回的值逐位相等
+    decoded, id = decodeCursor(encodeCursor(rank, 7))
+    assert id == 7
+    assert decoded == rank and (rank is None or isinstance(decoded, float))
+
+
+@pytest.mark.parametrize("payload", [[1.5, 1], [True, 1], ["zz", 1], [None, True], [None, [1]], [None]])
+def test_invalid_cursor(payload):
+    with pytest.raises(ValueError):
+        decodeCursor(_raw(payload))
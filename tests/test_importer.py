@@ -0,0 +1,39 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from core.importer import ImportFileError, readUploadRows
+
+
+def _csv(rows: int, encoding: str = "utf-8") -> bytes:
+    lines = ["id,name,class_id"] + [f"{2020000000 + i},学生{i},1" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode(encoding)
+
+
+def _upload(data: bytes, filename: str = "students.csv") -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=filename)
+
+
+def test_utf8_csv():
+    rows = readUploadRows(_upload(_csv(3)))
+    assert [row["name"] for row in rows] == ["学生0", "学生1", "学生2"]
+
+
+def test_gbk_csv():
+    rows = readUploadRows(_upload(_csv(3, "gbk")))
+    assert [row["name"] for row in rows] == ["学生0", "学生1", "学生2"]
+
+
+def test_bad_byte_after_first_batch_is_rejected_before_import():
+    # 损坏出现在第一批 1000 行之后，整个文件在写库之前就应被拒绝
+    data = _csv(1200)
+    offset = data.index("学生1100".encode())
+    data = data[:offset] + b"\xff" + data[offset:]
+    with pytest.raises(ImportFileError):
+        readUploadRows(_upload(data))
+
+
+def test_unsupported_extension():
+    with pytest.raises(ImportFileError):
+        readUploadRows(_upload(b"", "students.txt"))
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import mysql
+
+from db.search import keywordMatch
+from models.base_class import Base
+from models.class_ import Class
+from models.profession import Profession
+from models.student import Student
+
+
+def _compileMySQL(keyword: str) -> str:
+    return str(keywordMatch(keyword, Student.name).compile(dialect=mysql.dialect()))
+
+
+def test_mysql_uses_fulltext_for_full_tokens():
+    sql = _compileMySQL("李明")
+    assert "MATCH" in sql and "LIKE" not in sql
+
+
+def test_mysql_single_character_falls_back_to_like():
+    # 单字短于 ngram 词元长度，前缀匹配会漏掉“李明”中的“明”
+    sql = _compileMySQL("明")
+    assert "LIKE" in sql and "MATCH" not in sql
+
+
+def test_single_character_matches_anywhere_in_name():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Profession.__table__, Class.__table__, Student.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(Profession.__table__), [{"id": 1, "name": "软件工程"}])
+        conn.execute(insert(Class.__table__), [{"id": 1, "name": "软件1班", "grade": 2020, "profession_id": 1}])
+        conn.execute(insert(Student.__table__), [{
+            "id": id, "name": name, "class_id": 1, "phone": "", "email": "",
+            "introduction": "", "avatar": "", "hashed_password": "",
+        } for id, name in (("2020000001", "李明"), ("2020000002", "明华"), ("2020000003", "张三"))])
+        rank = keywordMatch("明", Student.name)
+        ids = conn.execute(select(Student.id).where(rank > 0).order_by(Student.id)).scalars().all()
+    assert ids == ["2020000001", "2020000002"]